@@ -2,6 +2,14 @@
 import sys
 import subprocess as sub
 import compiler_modules.compy as c
+import compiler_modules.units as units
+import compiler_modules.backend as backend
+import compiler_modules.timing as timing
+import compiler_modules.log as log
+import compiler_modules.resolver as resolver
+import compiler_modules.manifest as manifest
+import compiler_modules.errors as errors
+import compiler_modules.consts as consts
 import shutil
 import platform
 import os
@@ -16,7 +24,7 @@ user_objs = []
 
 # --- Argument parsing ---
 if len(sys.argv) < 3:
-    print("Usage: Vox.py [-c|-r|-v] <file> [-os <OS>] [-o <output>] [-arch <32|64>]")
+    print("Usage: Vox.py [-c|-r|-v] <file> [-os <OS>] [-o <output>] [-arch <32|64>] [--no-cache] [--modules] [-j <N>] [--backend <llc|llvmlite>] [-O0|-O1|-O2|-O3|-Os] [--time-report] [--profile] [--import-graph] [--verbose|--trace]")
     sys.exit(1)
 
 debug = False
@@ -31,13 +39,34 @@ elif flag == "-r":
 elif flag == "-v":
     mode = "VER"
 elif flag == "-help":
-    print("Usage: Vox.py [-c|-r|-v] <file> [-os <OS>] [--noconsole] [--debug] [-o <output>] [-arch <32|64>]")
+    print("Usage: Vox.py [-c|-r|-v] <file> [-os <OS>] [--noconsole] [--debug] [-o <output>] [-arch <32|64>] [--no-cache] [--modules] [-j <N>] [--backend <llc|llvmlite>] [-O0|-O1|-O2|-O3|-Os] [--time-report] [--profile] [--import-graph] [--verbose|--trace]")
     sys.exit(0)
 elif flag == "-version":
     print("Verion 0.0.1 by Calam")
     sys.exit(0)
 elif flag == "-n":
     mode = "Norm"
+elif flag == "-stubs":
+    # global cache of lib dyn stub archives: Vox.py -stubs prewarm <lib.so|lib.dll>... | Vox.py -stubs prune [days]
+    import compiler_modules._libs_ as _libs_
+    import compiler_modules.cache as cache
+    action = sys.argv[2]
+    if action == "prewarm" and len(sys.argv) > 3:
+        for lib in sys.argv[3:]:
+            try:
+                made = _libs_.prewarm(lib)
+            except (OSError, RuntimeError, sub.CalledProcessError) as e:
+                print(f"{lib}: {e}")
+                sys.exit(1)
+            print(f"{lib}: {'stub generated' if made else 'already cached'}")
+    elif action == "prune":
+        days = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+        removed, kept = cache.prune_stubs(days)
+        print(f"Removed {removed} stubs unused for {days:g} days, kept {kept} in '{cache.stubs_dir()}'")
+    else:
+        print("Usage: Vox.py -stubs prewarm <lib.so|lib.dll>... | Vox.py -stubs prune [days]")
+        sys.exit(1)
+    sys.exit(0)
 elif flag == "-a":
     # Allow adding a path as the primary action: Vox.py -a <path>
     if len(sys.argv) < 3:
@@ -71,6 +100,13 @@ OS = "win" if sys.platform.startswith("win") else sys.platform
 output = "main"
 arch = "64"  # default to 64-bit
 cons = True
+use_cache = True
+separate = False
+jobs = 1
+codegen = "llc"
+opt_level = None  # IR is left unoptimized unless an -O flag is given
+profile = False
+import_graph = False
 
 # Parse extra arguments
 for i in range(3, len(sys.argv)):
@@ -82,6 +118,32 @@ for i in range(3, len(sys.argv)):
         arch = sys.argv[i+1]
     elif sys.argv[i] == "--noconsole":
         cons = False
+    elif sys.argv[i] == "--no-cache":
+        use_cache = False
+    elif sys.argv[i] == "--modules":
+        # compile every imported module into its own .ll/.o, rebuilding only what changed
+        separate = True
+    elif sys.argv[i] == "-j" and i+1 < len(sys.argv):
+        # number of llc processes to run at once
+        jobs = int(sys.argv[i+1])
+    elif sys.argv[i] == "--backend" and i+1 < len(sys.argv):
+        # llc (default) or llvmlite to assemble in process
+        codegen = sys.argv[i+1].lower()
+    elif sys.argv[i].startswith("-O") and sys.argv[i][2:] in backend.opt_levels:
+        opt_level = sys.argv[i][2:]
+    elif sys.argv[i] == "--verbose":
+        log.level = max(log.level, log.INFO)
+    elif sys.argv[i] == "--trace":
+        # dumps every lowering step, only for debugging the compiler itself
+        log.level = log.TRACE
+    elif sys.argv[i] == "--time-report":
+        timing.enabled = True
+    elif sys.argv[i] == "--profile":
+        # cProfile the compile step into <output>.prof
+        profile = True
+    elif sys.argv[i] == "--import-graph":
+        # print every import and the file it resolved to
+        import_graph = True
     elif sys.argv[i] == "-a" and i+1 < len(sys.argv):
         # add path to vox_path.json
         add_path = sys.argv[i+1]
@@ -115,60 +177,115 @@ for i in range(3, len(sys.argv)):
    
 
 # --- Read and compile ---
-with open(file, "r") as f:
-    code = f.read()
-
 asm_file = output[:-4] + ".asm"
-deps = c.compile(code, asm_file, mode, os=OS)
+ofile = output[:-4] + ".o"
+binary = output + ".exe" if OS.startswith("win") and not output.endswith(".exe") else output
 
-def readfile(path: str):
-    with open(path, "r") as f:
-        return f.read()
+# builds that link keep a manifest of their inputs and skip the stages whose inputs did not change
+manifest_path = manifest.path_for(binary)
+old_manifest = manifest.load(manifest_path) if mode != "CO" else None
+front = manifest.front_key(mode, OS, arch, separate)
 
-def writefile(path: str, content: str):
-    with open(path, "w") as f:
-        f.write(content)
+def run_compile():
+    if separate:
+        return units.compile_modules(file, asm_file, os_name=OS, arch=arch)
+    with open(file, "r") as f:
+        code = f.read()
+    return [asm_file + ".ll"], c.compile(code, asm_file, mode, os=OS, arch=arch, use_cache=use_cache, source_name=file)
 
-ofile = output[:-4] + ".o"
-code = readfile(asm_file + ".ll")
+if manifest.front_end_current(old_manifest, front):
+    ll_files, deps = old_manifest["ll_files"], old_manifest["libs"]
+    sources = list(old_manifest["sources"])
+    log.info("Sources unchanged since the last build, reusing its IR")
+else:
+    with timing.phase("compile"):
+        if profile:
+            import cProfile
+            prof = cProfile.Profile()
+            ll_files, deps = prof.runcall(run_compile)
+            prof.dump_stats(output + ".prof")
+            print(f"Wrote profile to '{output}.prof' (view with: python -m pstats {output}.prof)")
+        else:
+            ll_files, deps = run_compile()
+    sources = manifest.sources(file)
+
+if import_graph: print(resolver.format_graph())
 
-final_ir = f"source_filename = \"{sys.argv[2]}\"\n" + code 
-writefile(asm_file + ".ll", final_ir)
+# errors from any translation unit, not only the last one compiled, stop the build before llc and ld
+if errors.exit_code != 0:
+    print(f"{consts.RED_ESCAPE}Aborting due to errors{consts.RESET_ESCAPE}", file=sys.stderr)
+    if timing.enabled: timing.report()
+    sys.exit(errors.exit_code)
 
 if mode == "CO":
+    if timing.enabled: timing.report()
     sys.exit(0)
 
 # ---- Assemble & link ----
-print(f"OS: {OS}, output: {output}, arch: {arch}")
+log.info(f"OS: {OS}, output: {output}, arch: {arch}")
 if OS.startswith("win"):
     # prefer explicit llc path if available (shutil.which may find it)
     llc_exe = shutil.which("llc") or r"C:\\llvm\\bin\\llc.exe"
-    if llc_exe and os.path.exists(llc_exe):
-        sub.run([llc_exe, "-filetype=obj", "-march=x86-64", "-mtriple=x86_64-w64-mingw32", asm_file + '.ll', "-o", ofile], check=True)
+    if not os.path.exists(llc_exe): llc_exe = "llc"
+    llc_flags = ["-filetype=obj", "-march=x86-64", "-mtriple=x86_64-w64-mingw32"]
+    triple = "x86_64-w64-windows-gnu"  # normalized mingw32, llvmlite does not normalize triples itself
+else:
+    llc_exe = "llc"
+    llc_flags = ["-filetype=obj", "-march=x86-64"]
+    triple = None  # host
+
+# one object per .ll, only reassembled when its IR is newer than the object
+llc_jobs = [(ll, ofile if ll == asm_file + ".ll" else ll[:-3] + ".o") for ll in ll_files]
+if codegen == "llvmlite" and not backend.has_llvmlite():
+    log.warn("llvmlite is not installed, falling back to llc")
+    codegen = "llc"
+with timing.phase(codegen):
+    if codegen == "llvmlite":
+        backend.assemble_llvmlite(llc_jobs, triple, opt_level)
     else:
-        # fallback to shell-split invocation (will raise FileNotFoundError if not found)
-        cmd(f"llc -filetype=obj -march=x86-64 -mtriple=x86_64-w64-mingw32 {asm_file + '.ll'} -o {ofile}")
-    if not output.endswith(".exe"):
-        output += ".exe"
-    pre = f"ld {ofile} std/VRT_win.a -LC:/Strawberry/c/x86_64-w64-mingw32/lib -lkernel32 -luser32 -e _start"  # include essential libraries here
+        backend.assemble(llc_jobs, llc_exe, llc_flags, workers=jobs, opt_level=opt_level)
+objs_sect = " ".join(obj for ll, obj in llc_jobs)
+
+if OS.startswith("win"):
+    runtime = "std/VRT_win.a"
+    pre = f"ld {objs_sect} {runtime} -LC:/Strawberry/c/x86_64-w64-mingw32/lib -lkernel32 -luser32 -e _start"  # include essential libraries here
     deps_sect = " ".join(f"-l{dep}" for dep in deps if dep)     # avoids empty strings
     for dep in user_objs:
         deps_sect += f" {dep}"
-    full_cmd = f"{pre} {deps_sect} -o {output}"
+    ld_cmd = f"{pre} {deps_sect} -o {binary}"
 
     if not cons:
-        full_cmd += " --subsystem windows"
+        ld_cmd += " --subsystem windows"
     if debug:
-        full_cmd += " -g"
-        
-    cmd(full_cmd)
+        ld_cmd += " -g"
 
 else:
-    cmd(f"llc -filetype=obj -march=x86-64 {asm_file + '.ll'} -o {ofile}")
-    pre = f"ld {ofile} std/VRT_linux.a"
+    runtime = "std/VRT_linux.a"
+    pre = f"ld {objs_sect} {runtime}"
     deps_sect = ""
     for dep in deps:
         deps_sect += f" -l{dep}"
     for dep in user_objs:
         deps_sect += f" {dep}"
-    cmd(f"{pre} {deps_sect} -o {output} -e _start")
\ No newline at end of file
+    ld_cmd = f"{pre} {deps_sect} -o {binary} -e _start"
+
+link_inputs = [obj for ll, obj in llc_jobs] + [runtime] + user_objs + manifest.lib_files(deps, [os.getcwd()])
+if manifest.link_current(old_manifest, ld_cmd, binary):
+    log.info(f"'{binary}' is up to date")
+else:
+    with timing.phase("ld"):
+        cmd(ld_cmd)
+
+# errors.exit_code covers every unit of the build, ctx.context only the last one compiled
+if errors.exit_code == 0:
+    manifest.write(manifest_path, {
+        "front": front,
+        "sources": manifest.fingerprints(sources),
+        "ll_files": ll_files,
+        "libs": deps,
+        "ld": ld_cmd,
+        "link_inputs": manifest.fingerprints(link_inputs),
+        "output": manifest.fingerprint(binary),
+    })
+
+if timing.enabled: timing.report()
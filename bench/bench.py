@@ -0,0 +1,187 @@
+"""
+Front end throughput benchmark.
+
+Synthesizes Vox programs of growing size, one shape per case, and times compy.compile on each
+(preprocess, parse, lower and write the .ll, no llc). Reports lines/sec, peak Python memory and a
+scaling exponent per case: the slope of log(time) over log(size), fitted over all sizes,
+~1 for linear work and ~2 for quadratic work such as repeated string concatenation.
+
+Usage (from the repo root):
+    python bench/bench.py                    # run and check against bench/baseline.json
+    python bench/bench.py --update-baseline  # run and overwrite the baseline
+    python bench/bench.py --sizes 500,1000 --cases consts,if_chain
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import compiler_modules.ctx as ctx
+import compiler_modules.compy as compy
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SIZES = (250, 500, 1000, 2000)
+REPEAT = 5  # timed runs per size, the fastest is kept
+
+# a case is allowed this much more scaling exponent than the baseline before the check fails
+EXPONENT_SLACK = 0.35
+# no case may scale worse than this, whatever the baseline says (1 is linear, 2 quadratic)
+MAX_EXPONENT = 1.6
+# and may lose this fraction of the baseline's throughput (machines differ, so it is generous)
+THROUGHPUT_SLACK = 0.5
+
+def gen_consts(n: int) -> str:
+    return "".join(f"const c{i}: int = {i} * 3 + 1\n" for i in range(n))
+
+def gen_vars(n: int) -> str:
+    return "".join(f"var v{i}: int = {i}\n" for i in range(n))
+
+def gen_if_chain(n: int) -> str:
+    lines = ["var x: int = 3", "if x == 0:", "    var r0: int = 0"]
+    for i in range(1, n):
+        lines += [f"elif x == {i}:", f"    var r{i}: int = {i}"]
+    lines += ["else:", "    var rn: int = 1", "endif"]
+    return "\n".join(lines) + "\n"
+
+def gen_functions(n: int) -> str:
+    out = []
+    for i in range(n):
+        out += [f"fn int f{i}(a: int, b: int):", f"    const k{i}: int = {i}", "    return 5", "endfn"]
+    return "\n".join(out) + "\n"
+
+def gen_structs(n: int) -> str:
+    # one struct with n fields
+    fields = [f"    f{i}: int," for i in range(n)]
+    fields[-1] = fields[-1][:-1]
+    return "struct Big:\n" + "\n".join(fields) + "\nendstruct\n"
+
+def gen_dyn_imports(n: int) -> str:
+    return "".join(f"dyn_import fn int Imp{i}(a: int, b: ptr[char])\n" for i in range(n))
+
+CASES = {
+    "consts": gen_consts,
+    "vars": gen_vars,
+    "if_chain": gen_if_chain,
+    "functions": gen_functions,
+    "structs": gen_structs,
+    "dyn_imports": gen_dyn_imports,
+}
+
+def compile_once(code: str, out_dir: str) -> float:
+    """Seconds for one compy.compile of code with fresh compiler state."""
+    ctx.reset()
+    sink = io.StringIO()
+    # a collection landing in one run but not another is most of the run to run noise
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sink):
+            compy.compile(code, os.path.join(out_dir, "bench.asm"), "CO", os=sys.platform, use_cache=False)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+def peak_memory(code: str, out_dir: str) -> int:
+    # separate run, tracemalloc slows everything down too much to time with it on
+    tracemalloc.start()
+    try:
+        compile_once(code, out_dir)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def scaling_exponent(points: list) -> float:
+    # least squares slope in log-log space, less noisy than comparing two sizes
+    if len(points) < 2: return 1.0
+    xs = [math.log(p["size"]) for p in points]
+    ys = [math.log(p["seconds"]) for p in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+def run_case(name: str, sizes: list, repeat: int, out_dir: str) -> dict:
+    codes = [CASES[name](n) for n in sizes]
+    for code in codes: compile_once(code, out_dir)  # warm up, the first run pays for imports and caches
+    # every round times each size once, so a slow stretch of the machine hits all sizes alike
+    # instead of bending the slope, then the fastest round per size is kept
+    best = [math.inf] * len(sizes)
+    for _ in range(max(1, repeat)):
+        for i, code in enumerate(codes):
+            best[i] = min(best[i], compile_once(code, out_dir))
+    points = []
+    for n, code, secs in zip(sizes, codes, best):
+        lines = code.count("\n")
+        points.append({"size": n, "lines": lines, "seconds": secs,
+                       "lines_per_sec": lines / secs, "peak_bytes": peak_memory(code, out_dir)})
+    return {"points": points, "exponent": scaling_exponent(points), "lines_per_sec": points[-1]["lines_per_sec"]}
+
+def check(results: dict, baseline: dict) -> list:
+    failures = []
+    for name, res in results.items():
+        if res["exponent"] > MAX_EXPONENT:
+            failures.append(f"{name}: scaling exponent {res['exponent']:.2f} is superlinear (limit {MAX_EXPONENT})")
+        base = baseline.get(name)
+        if base is None: continue
+        if res["exponent"] > base["exponent"] + EXPONENT_SLACK:
+            failures.append(f"{name}: scaling exponent {res['exponent']:.2f} > baseline {base['exponent']:.2f} + {EXPONENT_SLACK}")
+        if res["lines_per_sec"] < base["lines_per_sec"] * (1 - THROUGHPUT_SLACK):
+            failures.append(f"{name}: {res['lines_per_sec']:.0f} lines/s < {1 - THROUGHPUT_SLACK:.0%} of baseline {base['lines_per_sec']:.0f}")
+    return failures
+
+def main():
+    ap = argparse.ArgumentParser(description="Voxy front end throughput benchmark")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated program sizes")
+    ap.add_argument("--cases", default=",".join(CASES), help="comma separated cases: " + ", ".join(CASES))
+    ap.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per size, the fastest is kept")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    cases = [c for c in args.cases.split(",") if c]
+    for c in cases:
+        if c not in CASES: ap.error(f"unknown case '{c}'")
+
+    os.chdir(ROOT)  # vox_path.json and std are looked up relative to the repo
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        print(f"{'case':<12}{'size':>7}{'lines':>8}{'ms':>10}{'lines/s':>12}{'peak KiB':>11}")
+        for name in cases:
+            res = run_case(name, sizes, args.repeat, out_dir)
+            results[name] = res
+            for p in res["points"]:
+                print(f"{name:<12}{p['size']:>7}{p['lines']:>8}{p['seconds'] * 1000:>10.1f}{p['lines_per_sec']:>12.0f}{p['peak_bytes'] / 1024:>11.0f}")
+            print(f"{name:<12} scaling exponent {res['exponent']:.2f}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({n: {"exponent": round(r["exponent"], 3), "lines_per_sec": round(r["lines_per_sec"])}
+                       for n, r in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote baseline '{args.baseline}'")
+        return 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f"No baseline at '{args.baseline}', run with --update-baseline to create one")
+        return 0
+    failures = check(results, baseline)
+    for msg in failures:
+        print("FAIL " + msg)
+    if not failures: print("OK, no regressions against the baseline")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
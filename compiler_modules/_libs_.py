@@ -1,5 +1,11 @@
 import compiler_modules.ctx as ctx
+import compiler_modules.cache as cache
+import compiler_modules.elfstub as elfstub
+import compiler_modules.elfread as elfread
+import compiler_modules.errors as errors
+import compiler_modules.log as log
 import os
+import shutil
 import subprocess as sub
 import tempfile
 
@@ -18,6 +24,7 @@ def dyn_to_static(lib_name: str, mingw: bool = False):
         return raw + ".a"
 
 def HandleStaticLib(lib_name: str, scope: str):
+    ctx.context.libs_opaque = True
     if lib_name.startswith("\""):
         lib_name = lib_name.replace("\"", "")
         ctx.context.libs_to_link.append(remove_ext(lib_name))
@@ -60,16 +67,22 @@ def generate_stub_lib(dll_path, output_lib=None):
     return output_lib
 
 def get_exports_from_so(so_path):
-    """Return list of exported symbols from a .so file using nm."""
+    """Return [(name, is_function)] of the symbols a .so file exports."""
+    try:
+        return [(name, sym.is_function) for name, sym in elfread.exports(so_path).items()]
+    except elfread.ElfError:
+        return get_exports_with_nm(so_path)  # e.g. a library without section headers
+
+def get_exports_with_nm(so_path):
     result = sub.run(["nm", "-D", "--defined-only", so_path],
                     capture_output=True, text=True, check=True)
     symbols = []
     for line in result.stdout.splitlines():
         parts = line.strip().split()
-        if len(parts) == 3:
-            _, type_char, name = parts
-        if type_char.upper() in ("T", "D", "B", "R") and len(parts) == 3:
-            symbols.append(name)
+        if len(parts) != 3: continue
+        _, type_char, name = parts
+        if type_char.upper() in ("T", "D", "B", "R"):
+            symbols.append((name, type_char.upper() == "T"))
     return symbols
 
 def generate_stub_a(so_path, output_a=None):
@@ -85,12 +98,15 @@ def generate_stub_a(so_path, output_a=None):
     if not symbols:
         raise RuntimeError("No exported symbols found in the .so file.")
 
+    if elfstub.supported():
+        # written directly, no compiler involved
+        return elfstub.write_stub_archive(symbols, output_a)
+
     with tempfile.TemporaryDirectory() as tmpdir:
         stub_c = os.path.join(tmpdir, "stub.c")
         f = open(stub_c, "w")
-        f.write("#include <stdio.h>\n")
-        for sym in symbols:
-            f.write(f"void {sym}() {{}}\n")
+        for sym, is_function in symbols:
+            f.write(f"void {sym}() {{}}\n" if is_function else f"char {sym}[8];\n")
         f.close()
 
         obj_file = os.path.join(tmpdir, "stub.o")
@@ -99,25 +115,81 @@ def generate_stub_a(so_path, output_a=None):
 
     return output_a
 
+def stub_generator(lib_path: str):
+    return generate_stub_lib if lib_path.endswith(".dll") else generate_stub_a
+
+def cached_stub(lib_path: str, output: str) -> str:
+    """
+    Write the stub for lib_path to output, from the global stub cache when this library was seen before.
+    output + ".key" remembers which library the stub came from, so a changed library is never
+    served its old stub and an unchanged one costs a stat.
+    """
+    kind = os.path.splitext(output)[1]
+    key = cache.stub_key(lib_path, kind)
+    if key is None: raise FileNotFoundError(f"Shared library not found: {lib_path}")
+    try:
+        with open(output + ".key", "r", encoding="utf-8") as f:
+            if f.read() == key and os.path.exists(output): return output
+    except OSError:
+        pass
+    hit = cache.lookup_stub(key)
+    if hit is not None:
+        shutil.copyfile(hit, output)
+    else:
+        stub_generator(lib_path)(lib_path, output)
+        cache.store_stub(key, output, lib_path)
+    with open(output + ".key", "w", encoding="utf-8") as f:
+        f.write(key)
+    return output
+
+def prewarm(lib_path: str) -> bool:
+    """Generate and cache the stub for a shared library without touching the project. False if it was cached already."""
+    kind = ".a"  # MakeLib names every stub .a, see dyn_to_static
+    key = cache.stub_key(lib_path, kind)
+    if key is None: raise FileNotFoundError(f"Shared library not found: {lib_path}")
+    if cache.lookup_stub(key) is not None: return False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cached_stub(os.path.abspath(lib_path), os.path.join(tmpdir, "stub" + kind))
+    return True
+
 def MakeLib(lib_name: str):
     cwd = os.getcwd()
     if lib_name.endswith(".dll"):
-        generate_stub_lib(cwd + "/" + lib_name, cwd + "/" + dyn_to_static(lib_name, True))
+        cached_stub(cwd + "/" + lib_name, cwd + "/" + dyn_to_static(lib_name, True))
     else:
-        generate_stub_a(cwd + "/" + lib_name, cwd + "/" + dyn_to_static(lib_name))
+        cached_stub(cwd + "/" + lib_name, cwd + "/" + dyn_to_static(lib_name))
 
 def HandleDynLib(lib_name: str, scope: str):
     cwd = os.getcwd()
 
     if lib_name.startswith("\""):
         lib_name = lib_name.replace("\"", "")
-        if os.path.exists(cwd + "/" + dyn_to_static(lib_name)):
-            ctx.context.libs_to_link.append(remove_ext(lib_name))
-        else:
+        ctx.context.stub_files.append(cwd + "/" + dyn_to_static(lib_name))
+        # a stub without its library next to it is used as is, otherwise it is kept in sync through the stub cache
+        if os.path.exists(cwd + "/" + lib_name) or not os.path.exists(cwd + "/" + dyn_to_static(lib_name)):
             MakeLib(lib_name)
-            ctx.context.libs_to_link.append(remove_ext(lib_name))
+        ctx.context.libs_to_link.append(remove_ext(lib_name))
+        record_exports(cwd + "/" + lib_name)
     elif lib_name.startswith("<"):
+        ctx.context.libs_opaque = True  # resolved by the linker, its exports are unknown here
         lib_name = lib_name.replace("<", "")
         lib_name = lib_name.replace(">", "")
         ctx.context.libs_to_link.append(remove_ext(lib_name))
 
+def record_exports(lib_path: str):
+    """Remember what a lib dyn library exports, for check_dyn_imports."""
+    try:
+        ctx.context.lib_exports.update(elfread.exports(lib_path))
+    except (OSError, elfread.ElfError):
+        ctx.context.libs_opaque = True  # a .dll or a stub without its library
+
+def check_dyn_imports():
+    """Warn about dyn_import fn declarations that the lib dyn libraries of this unit do not export as functions."""
+    exports = ctx.context.lib_exports
+    if not exports or ctx.context.libs_opaque: return
+    for name, lineN in ctx.context.dyn_imports:
+        sym = exports.get(name)
+        if sym is None:
+            log.warn(f"dyn_import fn '{name}' at {errors.Location(lineN)} is not exported by any lib dyn library")
+        elif not sym.is_function:
+            log.warn(f"dyn_import fn '{name}' at {errors.Location(lineN)} names data ({sym.type}), not a function")
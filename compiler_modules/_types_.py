@@ -2,6 +2,9 @@ import re
 import compiler_modules.errors as errors
 import compiler_modules.ctx as ctx
 import compiler_modules.utils as utils
+import compiler_modules.timing as timing
+import compiler_modules.log as log
+import compiler_modules.symbols as symbols
 
 # ---- type maps ----
 llvm_numbers = {
@@ -21,6 +24,7 @@ llvm_numbers = {
 }
 
 vox_numbers = set(llvm_numbers.keys())
+unsigned_types = {"uint8", "uchar", "uint16", "uint", "uint64", "bool"}
 
 def handle_bool(value: str) -> str:
     if value.lower() in ["true", "1"]:
@@ -34,16 +38,21 @@ def strchars(s: str) -> list[str]:
         chars_.append(c)
     return chars_
 
-def process_string(s: str, size: int) -> str:
-    old = len(strchars(s))
-    if old > size:
-        errors.err(f"String '{s}' too long for buff type (max {size} chars)")
+def escape_string(s: str) -> str:
+    """Vox escapes of a string literal as LLVM c"..." hex escapes."""
     s = s.replace("\\0", "\\00")
     s = s.replace("\\n", "\\0A")
     s = s.replace("\\t", "\\09")
     s = s.replace("\\r", "\\0D")
     s = s.replace("\\\"", "\\22")
     s = s.replace("\\\\", "\\5C")
+    return s
+
+def process_string(s: str, size: int) -> str:
+    old = len(strchars(s))
+    if old > size:
+        errors.err(f"String '{s}' too long for buff type (max {size} chars)")
+    s = escape_string(s)
     new_len = len(strchars(s))
     if new_len > size:
         errors.err(f"String '{s}' too long for buff type (max {size} chars)")
@@ -55,9 +64,11 @@ def process_string(s: str, size: int) -> str:
 def HandleGetElementPtr(name: str, base_type: str, value: str) -> str:
     # T* getelementptr ([N x T], [N x T]* @NAME, i32 0, i32 0)
     buff_name = value.replace("addr ", "").strip()
-    if not ctx.context.const_map.__contains__(buff_name):
+    buff = ctx.context.symbols.const(buff_name)
+    if buff is None:
         errors.err(f"Buffer '{buff_name}' not found for getelementptr")
-    type_ = ctx.context.const_map[buff_name][1]
+        return ""
+    type_ = buff.type
     base, size = parse_buff_type(type_)
     if not base in llvm_numbers or not base_type in llvm_numbers:
         errors.err(f"Unknown base type '{base}' for getelementptr")
@@ -69,27 +80,36 @@ def HandleGetElementPtr(name: str, base_type: str, value: str) -> str:
     return f"@{name} = constant {base_type}* getelementptr ([{size} x {base_type}], [{size} x {base_type}]* @{buff_name}, i32 0, i32 0)"
 
 
-def vox_type_to_llvm(vox_type: str) -> str:
+buff_re = re.compile(r"buff\[(\w+)(?:\s*;\s*(\d+))?\]")
+
+class VoxType:
     """
-    Recursively convert a Vox type to an LLVM type.
-    Supports:
-        - ptr[T]
-        - buff[T; N]
-        - basic types in llvm_numbers
+    A parsed Vox type, interned per type string in ctx.context.symbols.type_cache.
+    Aliases resolve to the object of the aliased type, llvm is None for types LLVM can't spell (structs, unknown).
     """
-    global llvm_numbers
-    vox_type = vox_type.strip()
-    
+    __slots__ = ("text", "kind", "llvm", "inner", "size")
+
+    def __init__(self, text: str, kind: str, llvm, inner=None, size=None):
+        self.text = text
+        self.kind = kind    # number | ptr | buff | unknown
+        self.llvm = llvm
+        self.inner = inner  # ptr: VoxType of the pointee, buff: element type name
+        self.size = size    # buff: element count or None
+
+    def __repr__(self):
+        return f"VoxType({self.text!r} -> {self.llvm})"
+
+def _parse_type(vox_type: str) -> VoxType:
     # Pointer type
     if vox_type.startswith("ptr[") and vox_type.endswith("]"):
-        inner = vox_type[4:-1].strip()
-        llvm_inner = vox_type_to_llvm(inner)
-        if inner.startswith("buff"):
-            return f"{llvm_inner}"
-        return f"{llvm_inner}*"
-    
+        inner_text = vox_type[4:-1].strip()
+        inner = resolve_type(inner_text)
+        if inner_text.startswith("buff"):
+            return VoxType(vox_type, "ptr", f"{inner.llvm}", inner)
+        return VoxType(vox_type, "ptr", f"{inner.llvm}*", inner)
+
     # Buffer type
-    buff_match = re.match(r"buff\[(\w+)(?:\s*;\s*(\d+))?\]", vox_type)
+    buff_match = buff_re.match(vox_type)
     if buff_match:
         inner_type = buff_match.group(1)
         size = buff_match.group(2)
@@ -97,17 +117,37 @@ def vox_type_to_llvm(vox_type: str) -> str:
         if llvm_inner is None:
             errors.err(f"Unknown buffer type: {inner_type}")
         if size:
-            return f"[{size} x {llvm_inner}]"
-        else:
-            # unspecified length buffer
-            return f"{llvm_inner}*"
-        
-    if vox_type in ctx.context.aliases.keys():
-        return vox_type_to_llvm(ctx.context.aliases[vox_type])
-    
+            return VoxType(vox_type, "buff", f"[{size} x {llvm_inner}]", inner_type, int(size))
+        # unspecified length buffer
+        return VoxType(vox_type, "buff", f"{llvm_inner}*", inner_type)
+
+    alias = ctx.context.symbols.alias(vox_type)
+    if alias is not None:
+        return resolve_type(alias)
+
     # Simple type
     llvm_type = llvm_numbers.get(vox_type)
-    return llvm_type
+    return VoxType(vox_type, "number" if llvm_type is not None else "unknown", llvm_type)
+
+def resolve_type(vox_type: str) -> VoxType:
+    """Parse a Vox type once, later calls (until an alias or struct changes) are a dict lookup."""
+    cache = ctx.context.symbols.type_cache
+    t = cache.get(vox_type)
+    if t is None:
+        cache[vox_type] = VoxType(vox_type, "unknown", None)  # placeholder, ends alias cycles
+        t = cache[vox_type] = _parse_type(vox_type.strip())
+    return t
+
+def vox_type_to_llvm(vox_type: str) -> str:
+    """
+    Convert a Vox type to an LLVM type.
+    Supports:
+        - ptr[T]
+        - buff[T; N]
+        - basic types in llvm_numbers
+        - using aliases of any of these
+    """
+    return resolve_type(vox_type).llvm
 
 # helper to parse buff type
 def parse_buff_type(type_token: str) -> tuple[str, int]:
@@ -151,13 +191,16 @@ bool_dyn_count = 0
 def get_tmp_bool():
     global bool_dyn_count
     bool_dyn_count+=1
+    timing.count("temporaries (get_tmp_bool)")
     return f"tmp_bool{bool_dyn_count}"
 
 def add_to_current_scope(s: str): utils.AddToScope(s, ctx.context.current_function)
 
+ident_re = re.compile(r"[A-Za-z_]\w*")
+
 def is_static_bool_expr(expr: str) -> bool:
-   maps = list(ctx.context.const_map.keys()) + list(ctx.context.var_map)
-   if any(x in expr for x in maps): return False
+   # any identifier bound to a value (const, var, arg) makes it a runtime expression
+   if any(ctx.context.symbols.lookup(name) is not None for name in ident_re.findall(expr)): return False
    return not re.search(r"\*\([\d\s\+\-\*\/\.]+\)", expr)
 
 def convert_to_python_syntax(expr: str) -> str:
@@ -168,7 +211,7 @@ def eval_static_bool_expr(expr):
 
 def llvm_bool_var(name: str) -> str:
    tmp = get_tmp_bool()
-   add_to_current_scope(f"%{tmp} = load i1, i1* @{name}\n")
+   add_to_current_scope(f"%{tmp} = load i1, i1* {ctx.context.symbols.address(name)}\n")
    return f"%{tmp}"
 
 def is_literal(expr):
@@ -186,15 +229,77 @@ def is_literal(expr):
     
 def load_t(name, type):
     tmp = "%" + get_tmp_bool()
-    add_to_current_scope(f"    {tmp} = load {type}, {type}* @{name}\n")
+    add_to_current_scope(f"    {tmp} = load {type}, {type}* {ctx.context.symbols.address(name)}\n")
+    return tmp
+
+def load_const(name, type):
+    """load_t for a const, reusing the value already loaded from the same pointer in this basic block."""
+    block = utils.ScopeIR(ctx.context.current_function).current_block()
+    key = (ctx.context.symbols.address(name), type)
+    tmp = block.loads.get(key)
+    if tmp is None:
+        tmp = block.loads[key] = load_t(name, type)
+    else:
+        timing.count("const loads reused")
+    return tmp
+
+def int_bits(llvm_type: str):
+    return int(llvm_type[1:]) if llvm_type.startswith("i") and llvm_type[1:].isdigit() else None
+
+float_bits = {"float": 32, "double": 64}
+
+def int_range(llvm_type: str, unsigned: bool) -> tuple:
+    """[low, high) of the values an integer type holds."""
+    bits = int_bits(llvm_type)
+    return (0, 1 << bits) if unsigned else (-(1 << bits - 1), 1 << bits - 1)
+
+def convert(value: str, from_type: str, to_type: str, unsigned: bool = False) -> str:
+    """value of LLVM type from_type as to_type, with the implicit C conversions between numbers."""
+    if from_type == to_type: return value
+    a, b = int_bits(from_type), int_bits(to_type)
+    if a and b: op = "trunc" if a > b else ("zext" if unsigned else "sext")
+    elif from_type in float_bits and to_type in float_bits: op = "fptrunc" if float_bits[from_type] > float_bits[to_type] else "fpext"
+    elif a and to_type in float_bits: op = "uitofp" if unsigned else "sitofp"
+    elif from_type in float_bits and b: op = "fptosi"
+    elif from_type.endswith("*") and to_type.endswith("*"): op = "bitcast"
+    else:
+        errors.err(f"Cannot convert {from_type} to {to_type}")
+        return value
+    tmp = "%" + get_tmp_bool()
+    add_to_current_scope(f"    {tmp} = {op} {from_type} {value} to {to_type}\n")
     return tmp
 
+def load_as(name: str, llvm_type: str) -> str:
+    """Value of an arg, var or const read with its own type and converted to llvm_type."""
+    sym = ctx.context.symbols.lookup(name)
+    own = vox_type_to_llvm(sym.type)
+    if own is None:
+        errors.err(f"Unknown type '{sym.type}' of '{name}'")
+        return "undef"
+    if sym.kind == symbols.ARG: value = f"%{name}"
+    elif sym.kind == symbols.CONST: value = load_const(name, own)
+    else: value = load_t(name, own)
+    return convert(value, own, llvm_type, sym.type in unsigned_types)
+
 def is_const(name):
-    print(f"matching: {name}")
-    return name in list(ctx.context.const_map.keys())
+    if log.level >= log.TRACE: log.trace(f"matching: {name}")
+    return ctx.context.symbols.is_const(name)
 
 def is_var(name):
-    return name in list(ctx.context.var_map.keys())
+    return ctx.context.symbols.is_var(name)
+
+fcmp_ops = {"eq": "oeq", "ne": "one", "sle": "ole", "slt": "olt", "sge": "oge", "sgt": "ogt"}
+
+def bool_operand(text: str) -> tuple:
+    """(LLVM value, LLVM type or None for literals) of one side of a binary condition."""
+    if text in ("True", "False"): return ("1" if text == "True" else "0"), None
+    if is_literal(text): return text, None
+    sym = ctx.context.symbols.lookup(text)
+    if sym is not None and sym.kind == symbols.ARG: return f"%{text}", vox_type_to_llvm(sym.type)
+    if sym is not None and sym.kind in (symbols.VAR, symbols.CONST):
+        ty = vox_type_to_llvm(sym.type)
+        return (load_t(text, ty) if sym.kind == symbols.VAR else load_const(text, ty)), ty
+    return handle_bool_expr(text), "i1"
 
 def handle_bool_expr(expr: str) -> str:
    expr = expr.strip()
@@ -212,40 +317,39 @@ def handle_bool_expr(expr: str) -> str:
    for op, llvm_op in [("&&","and"),("||","or"),("^^","xor"),("==","eq"),("!=","ne"),("<=","sle"),("<","slt"),(">=","sge"),(">","sgt")]:
        if op in expr:
             lhs,rhs = map(str.strip, expr.split(op,1))
-            lval,rval = handle_bool_expr(lhs), handle_bool_expr(rhs)
-            cmp_t = ""
-            if is_literal(rhs):
-               if rhs == "True": rval = 1
-               elif rhs == "False": rval = 0
-               else: rval = rhs
-            if is_literal(lhs):
-               if lhs == "True": lval = 1
-               elif lhs == "False": lval = 0
-               else: lval = lhs
-            if is_var(lhs):
-                cmp_t = vox_type_to_llvm(ctx.context.var_map[lhs])
-                lval = load_t(lhs, cmp_t)
-            elif is_const(lhs):
-                lval = load_t(lhs, vox_type_to_llvm(ctx.context.const_map[lhs][1]))
-            if is_var(rhs):
-                rval = load_t(lhs, vox_type_to_llvm(ctx.context.var_map[rhs]))
-            elif is_const(rhs):
-                rval = load_t(rhs, vox_type_to_llvm(ctx.context.const_map[rhs][1]))
+            (lval, lt), (rval, rt) = bool_operand(lhs), bool_operand(rhs)
             tmp = get_tmp_bool()
-            # use icmp for comparison ops, logical ops directly
+            # use icmp for comparison ops, typed by the named operand, logical ops directly
             if llvm_op in ["eq","ne","sle","slt","sge","sgt"]:
-                add_to_current_scope(f"%{tmp} = icmp {llvm_op} i1 {lval}, {rval}\n")
+                cmp_t = lt or rt or "i1"
+                if cmp_t in ("float", "double"):
+                    add_to_current_scope(f"%{tmp} = fcmp {fcmp_ops[llvm_op]} {cmp_t} {lval}, {rval}\n")
+                else:
+                    if (lt is None) != (rt is None) and int_bits(cmp_t):
+                        # LLVM truncates a literal that does not fit (char == 300 would match 44), compare in i64 like C
+                        named, literal = (lhs, rval) if lt else (rhs, lval)
+                        sym = ctx.context.symbols.lookup(named)
+                        unsigned = sym is not None and sym.type in unsigned_types
+                        low, high = int_range(cmp_t, unsigned)
+                        try: outside = not low <= int(literal, 0) < high
+                        except ValueError: outside = False
+                        if outside:
+                            if lt: lval = convert(lval, cmp_t, "i64", unsigned)
+                            else: rval = convert(rval, cmp_t, "i64", unsigned)
+                            cmp_t = "i64"
+                    add_to_current_scope(f"%{tmp} = icmp {llvm_op} {cmp_t} {lval}, {rval}\n")
             else:
                add_to_current_scope(f"%{tmp} = {llvm_op} i1 {lval}, {rval}\n")
             return f"%{tmp}"
    # single variable or API call
    if utils.word_count(expr) == 1:
        name = expr
-       if name in ctx.context.var_map or name in ctx.context.const_map:
+       sym = ctx.context.symbols.lookup(name)
+       if sym is not None and (sym.kind == symbols.VAR or sym.kind == symbols.CONST):
            tmp = get_tmp_bool()
-           # determine type from const_map, default i1
-           ty = vox_type_to_llvm(ctx.context.const_map[name][1]) if name in ctx.context.const_map else "i1"
-           add_to_current_scope(f"%{tmp}_val = load {ty}, {ty}* @{name}\n")
+           # determine type from the const, default i1
+           ty = vox_type_to_llvm(sym.type) if sym.kind == symbols.CONST else "i1"
+           add_to_current_scope(f"%{tmp}_val = load {ty}, {ty}* {ctx.context.symbols.address(name)}\n")
            if ty == "i32":  # integer -> i1
                tmp2 = get_tmp_bool()
                add_to_current_scope(f"%{tmp2} = icmp ne i32 %{tmp}_val, 0\n")
@@ -0,0 +1,148 @@
+import compiler_modules.consts as consts
+import compiler_modules.log as log
+import compiler_modules.timing as timing
+import concurrent.futures as futures
+import os
+import shutil
+import subprocess as sub
+import sys
+import time
+
+try:
+    import llvmlite.binding as llvm
+except ImportError:
+    llvm = None  # optional, the llc backend works without it
+
+# Turns .ll files into objects. Every module is an independent llc process,
+# so a thread per running job is enough to keep N cores busy.
+# The llvmlite backend does the same in process, without spawning llc.
+
+_llvm_ready = False
+
+# -O<level> for Voxy.py: the IR pass pipeline and the codegen level it maps to.
+# None keeps the old behavior of unoptimized IR and llc's default codegen.
+opt_levels = ("0", "1", "2", "3", "s")
+
+def codegen_level(opt_level: str) -> int:
+    return 2 if opt_level == "s" else int(opt_level)
+
+def needs_rebuild(ll: str, obj: str, stamp: str) -> bool:
+    """An object is stale when its IR is newer or it was built with other settings (kept in <obj>.cmd)."""
+    if not os.path.exists(obj) or os.path.getmtime(obj) < os.path.getmtime(ll): return True
+    try:
+        with open(obj + ".cmd", "r", encoding="utf-8") as f:
+            return f.read() != stamp
+    except OSError:
+        return True
+
+def write_stamp(obj: str, stamp: str):
+    with open(obj + ".cmd", "w", encoding="utf-8") as f:
+        f.write(stamp)
+
+def find_opt(llc_exe: str):
+    """opt from the same LLVM install as llc, else from PATH."""
+    install = os.path.dirname(llc_exe)
+    return (install and shutil.which("opt", path=install)) or shutil.which("opt")
+
+def run_llc(llc_exe: str, llc_flags: list, ll: str, obj: str, opt_exe: str = None, opt_level: str = None):
+    """Returns (seconds, completed process). With opt_level the IR goes through opt's -O pipeline first."""
+    start = time.perf_counter()
+    src = ll
+    if opt_level is not None:
+        llc_flags = [*llc_flags, f"-O{codegen_level(opt_level)}"]
+        if opt_exe is not None:
+            src = obj + ".opt.bc"
+            proc = sub.run([opt_exe, f"-O{opt_level}", ll, "-o", src], capture_output=True, text=True)
+            if proc.returncode != 0: return time.perf_counter() - start, proc
+    proc = sub.run([llc_exe, *llc_flags, src, "-o", obj], capture_output=True, text=True)
+    if src != ll and os.path.exists(src): os.remove(src)
+    return time.perf_counter() - start, proc
+
+def assemble(jobs: list, llc_exe: str, llc_flags: list, workers: int = 1, opt_level: str = None):
+    """
+    jobs: [(ll path, obj path)], objects newer than their IR and built with the same settings are skipped.
+    Runs up to workers llc processes at once, prints one timing line per module
+    and stops at the first failure (modules not started yet are cancelled).
+    """
+    opt_exe = None
+    if opt_level is not None:
+        opt_exe = find_opt(llc_exe)
+        if opt_exe is None: log.warn("opt not found, only llc's codegen optimizations will run")
+    stamp = " ".join(["llc", *llc_flags, f"-O{opt_level}" if opt_level is not None else "", opt_exe or ""])
+    todo = [(ll, obj) for ll, obj in jobs if needs_rebuild(ll, obj, stamp)]
+    if not todo: return
+    workers = max(1, min(workers, len(todo)))
+    total = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {pool.submit(run_llc, llc_exe, llc_flags, ll, obj, opt_exe, opt_level): (ll, obj) for ll, obj in todo}
+        for done in futures.as_completed(running):
+            secs, proc = done.result()
+            ll, obj = running[done]
+            if proc.returncode != 0:
+                for f in running: f.cancel()
+                sys.stderr.write(proc.stderr)
+                print(consts.RED_ESCAPE + f"{os.path.basename(proc.args[0])} failed on '{ll}' (exit code {proc.returncode})" + consts.RESET_ESCAPE, file=sys.stderr)
+                sys.exit(proc.returncode)
+            write_stamp(obj, stamp)
+            print(f"  llc {ll}: {secs * 1000:.1f} ms")
+            timing.add(f"llc {os.path.basename(ll)}", secs)
+    print(f"Assembled {len(todo)} module(s) in {(time.perf_counter() - total) * 1000:.1f} ms with {workers} job(s)")
+
+def has_llvmlite() -> bool:
+    return llvm is not None
+
+def _init_llvm():
+    global _llvm_ready
+    if _llvm_ready: return
+    llvm.initialize_all_targets()
+    llvm.initialize_all_asmprinters()
+    _llvm_ready = True
+
+def pipeline_options(opt_level: str):
+    # llvmlite has no size level, -Os is -O2 without unrolling/vectorization and with the -Os inline threshold
+    pto = llvm.create_pipeline_tuning_options(speed_level=codegen_level(opt_level))
+    if opt_level == "s":
+        pto.loop_unrolling = False
+        pto.loop_vectorization = False
+        pto.slp_vectorization = False
+        pto.inlining_threshold = 75
+    return pto
+
+def emit_object(ll: str, obj: str, triple: str = None, opt_level: str = None):
+    """Parse, verify, optimize and assemble one .ll into obj with llvmlite (triple None = host)."""
+    _init_llvm()
+    with open(ll, "r", encoding="utf-8") as f:
+        mod = llvm.parse_assembly(f.read())
+    mod.verify()
+    triple = triple or llvm.get_default_triple()
+    mod.triple = triple
+    tm = llvm.Target.from_triple(triple).create_target_machine(opt=codegen_level(opt_level or "2"), codemodel="default")
+    mod.data_layout = str(tm.target_data)
+    if opt_level is not None:
+        # the standard default<On> pipeline: mem2reg, instcombine, GVN, inlining, DCE, ...
+        pb = llvm.create_pass_builder(tm, pipeline_options(opt_level))
+        pb.getModulePassManager().run(mod, pb)
+    with open(obj, "wb") as f:
+        f.write(tm.emit_object(mod))
+
+def assemble_llvmlite(jobs: list, triple: str = None, opt_level: str = None):
+    """
+    Same contract as assemble() but in process. LLVM's global context is not thread safe,
+    so modules are done one after another.
+    """
+    stamp = f"llvmlite {triple} -O{opt_level}"
+    todo = [(ll, obj) for ll, obj in jobs if needs_rebuild(ll, obj, stamp)]
+    if not todo: return
+    total = time.perf_counter()
+    for ll, obj in todo:
+        start = time.perf_counter()
+        try:
+            emit_object(ll, obj, triple, opt_level)
+        except RuntimeError as e:
+            print(consts.RED_ESCAPE + f"llvmlite failed on '{ll}': {e}" + consts.RESET_ESCAPE, file=sys.stderr)
+            sys.exit(1)
+        write_stamp(obj, stamp)
+        secs = time.perf_counter() - start
+        print(f"  llvmlite {ll}: {secs * 1000:.1f} ms")
+        timing.add(f"llvmlite {os.path.basename(ll)}", secs)
+    print(f"Assembled {len(todo)} module(s) in {(time.perf_counter() - total) * 1000:.1f} ms in process")
@@ -0,0 +1,194 @@
+import compiler_modules.ctx as ctx
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Content addressed cache of preprocessed source and generated IR.
+# Layout: <CACHE_DIR>/ir/<key[:2]>/<key>/{pre.vpy, main.ll, meta.json}
+CACHE_DIR = os.environ.get("VOXY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "voxy"))
+
+_compiler_hash = None
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_file(path: str):
+    """Hash of a file's content, None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return sha256_bytes(f.read())
+    except OSError:
+        return None
+
+def compiler_hash() -> str:
+    """Fingerprint of the compiler itself so edits to compiler_modules invalidate old entries."""
+    global _compiler_hash
+    if _compiler_hash is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(here)):
+            if name.endswith(".py"):
+                h.update(name.encode())
+                with open(os.path.join(here, name), "rb") as f:
+                    h.update(f.read())
+        _compiler_hash = h.hexdigest()
+    return _compiler_hash
+
+def make_key(code: str, os_name: str, arch: str, dialect: str) -> str:
+    """Key for a translation unit: source, ifdefs, target and compiler (imports are validated on lookup)."""
+    h = hashlib.sha256()
+    for part in (compiler_hash(), code, "\0".join(sorted(ctx.context.ifdef_defs)), os_name, arch, dialect,
+                 sha256_file("vox_path.json") or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def entry_dir(key: str) -> str:
+    return os.path.join(CACHE_DIR, "ir", key[:2], key)
+
+def lookup(key: str):
+    """Return the meta dict of a valid entry for key, or None on a miss."""
+    path = entry_dir(key)
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # every file the preprocessor looked at must still hash the same (None = still missing)
+    for probe, digest in meta["imports"].items():
+        if sha256_file(probe) != digest: return None
+    for stub in meta["stubs"]:
+        if not os.path.exists(stub): return None
+    if not os.path.exists(os.path.join(path, "main.ll")): return None
+    return meta
+
+def restore(key: str, ll_path: str):
+    shutil.copyfile(os.path.join(entry_dir(key), "main.ll"), ll_path)
+
+def store(key: str, preprocessed: str, ll_path: str):
+    """Save the current translation unit, written atomically so concurrent builds never see half an entry."""
+    path = entry_dir(key)
+    meta = {
+        "imports": ctx.context.import_probes,
+        "stubs": ctx.context.stub_files,
+        "libs": ctx.context.libs_to_link,
+        "graph": ctx.context.import_graph,
+    }
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path))
+        with open(os.path.join(tmp, "pre.vpy"), "w", encoding="utf-8") as f:
+            f.write(preprocessed)
+        shutil.copyfile(ll_path, os.path.join(tmp, "main.ll"))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        if os.path.exists(path): shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    except OSError:
+        # the cache is an optimization only, never fail a build because of it
+        if tmp is not None: shutil.rmtree(tmp, ignore_errors=True)
+
+
+# Stub archives generated for lib dyn, shared by every project on the machine.
+# Layout: <CACHE_DIR>/stubs/<key[:2]>/<key>/{stub, meta.json}, key = content hash of the shared library
+# and the stub format, plus <CACHE_DIR>/stubs/stat/<hash of path, size, mtime> holding that content hash
+# so an unchanged library is not rehashed on every build.
+STUB_VERSION = "3"  # bump when the stub generators in _libs_ change
+
+def stubs_dir() -> str:
+    return os.path.join(CACHE_DIR, "stubs")
+
+def library_hash(lib_path: str):
+    """Content hash of a shared library, memoized by path, size and mtime. None if it does not exist."""
+    abs_path = os.path.abspath(lib_path)
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+    memo = os.path.join(stubs_dir(), "stat", sha256_bytes(f"{abs_path}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")))
+    try:
+        with open(memo, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    digest = sha256_file(abs_path)
+    try:
+        os.makedirs(os.path.dirname(memo), exist_ok=True)
+        with open(memo + ".tmp", "w", encoding="utf-8") as f:
+            f.write(digest)
+        os.replace(memo + ".tmp", memo)
+    except OSError:
+        pass
+    return digest
+
+def stub_key(lib_path: str, kind: str):
+    """Key of the stub (kind = '.a' or '.lib') generated from a shared library, None if the library is missing."""
+    digest = library_hash(lib_path)
+    if digest is None: return None
+    return sha256_bytes(f"{STUB_VERSION}\0{kind}\0{digest}".encode("utf-8"))
+
+def stub_entry_dir(key: str) -> str:
+    return os.path.join(stubs_dir(), key[:2], key)
+
+def lookup_stub(key: str):
+    """Path of the cached stub for key, or None. A hit refreshes the entry for prune_stubs."""
+    path = stub_entry_dir(key)
+    stub = os.path.join(path, "stub")
+    if not os.path.exists(stub): return None
+    try:
+        os.utime(os.path.join(path, "meta.json"))
+    except OSError:
+        pass
+    return stub
+
+def store_stub(key: str, stub_path: str, lib_path: str):
+    """Save a generated stub, atomically like store()."""
+    path = stub_entry_dir(key)
+    meta = {"library": os.path.abspath(lib_path), "version": STUB_VERSION}
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path))
+        shutil.copyfile(stub_path, os.path.join(tmp, "stub"))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        if os.path.exists(path): shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None: shutil.rmtree(tmp, ignore_errors=True)
+
+def prune_stubs(max_age_days: float) -> tuple:
+    """Delete stubs and stat memos not used for max_age_days. Returns (removed, kept) stub counts."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = kept = 0
+    root = stubs_dir()
+    if not os.path.isdir(root): return removed, kept
+    for shard in os.listdir(root):
+        shard_dir = os.path.join(root, shard)
+        if not os.path.isdir(shard_dir): continue
+        for name in os.listdir(shard_dir):
+            entry = os.path.join(shard_dir, name)
+            if shard == "stat":
+                stamp = entry
+            else:
+                stamp = os.path.join(entry, "meta.json")
+            try:
+                used = os.path.getmtime(stamp)
+            except OSError:
+                used = 0  # half written or damaged
+            if used >= cutoff:
+                if shard != "stat": kept += 1
+                continue
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+            else:
+                try:
+                    os.remove(entry)
+                except OSError:
+                    pass
+    return removed, kept
@@ -1,6 +1,4 @@
-import regex as re
 import sys
-import compiler_modules.consts as consts
 import compiler_modules._types_ as _types_
 import compiler_modules.ctx as ctx
 import compiler_modules.preproc as preproc
@@ -9,6 +7,15 @@ import compiler_modules.functions as functions
 import compiler_modules.parsing as parsing
 import compiler_modules.errors as errors
 import compiler_modules.utils as utils
+import compiler_modules.frontend as frontend
+import compiler_modules.nodes as nodes
+import compiler_modules.symbols as symbols
+import compiler_modules.cache as cache
+import compiler_modules.timing as timing
+import compiler_modules.log as log
+import compiler_modules.resolver as resolver
+import compiler_modules._libs_ as _libs_
+import compiler_modules.evals as evals
 
 
 def get_temp_fn_store():   # generate unique function call label
@@ -37,30 +44,55 @@ def tmp_var():
     """Generate a unique temporary variable name."""
     global tmp_var_count
     tmp_var_count += 1
+    timing.count("temporaries (tmp_var)")
     return f"%t{tmp_var_count}"
 
-def getArgs(toks: list[str]):
-    args = {}
-    # Clean tokens: remove empty strings and stray ':' tokens
-    cleaned = [t for t in toks if t is not None and t.strip() != '' and t != ':']
-    # Expect cleaned layout: [RET_TYPE, FUNC_NAME, ARG1_NAME, ARG1_TYPE, ARG2_NAME, ARG2_TYPE, ...]
-    for i in range(2, len(cleaned), 2):
-        name = cleaned[i]
-        if i + 1 < len(cleaned):
-            typ = cleaned[i + 1]
-            args[name] = typ
-        else:
-            errors.FATAL("Missing type for argument")
-    return args
-
-import re
-
-if_num = 0
-
 def AddToCurrent(code: str):
     utils.AddToScope(code, ctx.context.current_function)
 
-def Handle_IF(code: str):
+switch_min_cases = 3  # shorter chains stay a compare and branch cascade
+switch_types = ("i8", "i16", "i32", "i64")
+
+def case_value(text: str):
+    """Integer a switch case can use for text, a literal or a folded const, else None."""
+    try:
+        return int(text, 0)
+    except ValueError:
+        pass
+    if _types_.ident_re.fullmatch(text) is None: return None
+    try:
+        value = evals.lookup(text)
+    except evals.NotConstant:
+        return None
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def switch_cases(node: nodes.If):
+    """
+    (llvm type, scrutinee name, [case value]) when every branch of node is NAME == constant on the
+    same integer var, const or arg NAME, with no value repeated and every value in range of NAME's type,
+    else None.
+    """
+    if len(node.branches) < switch_min_cases: return None
+    table = ctx.context.symbols
+    name, values = None, []
+    for cond, _ in node.branches:
+        if cond.count("==") != 1 or any(op in cond for op in ("!=", "<", ">", "&&", "||", "^^", "!", "(")): return None
+        lhs, rhs = map(str.strip, cond.split("==", 1))
+        value = case_value(rhs)
+        if value is None: lhs, rhs, value = rhs, lhs, case_value(lhs)
+        if value is None or value in values: return None
+        if name is None: name = lhs
+        elif lhs != name: return None
+        values.append(value)
+    sym = table.lookup(name)
+    if sym is None or sym.kind not in (symbols.VAR, symbols.CONST, symbols.ARG): return None
+    llvm_type = _types_.llvm_numbers.get(sym.type)
+    if llvm_type not in switch_types: return None
+    low, high = _types_.int_range(llvm_type, sym.type in _types_.unsigned_types)
+    if any(not low <= value < high for value in values): return None  # e.g. 300 on a char, never equal
+    return llvm_type, name, values
+
+def Handle_IF(node: nodes.If, scope: str):
     # if CONDITON:
     #     BODY
     # elif CONDITION:
@@ -71,203 +103,226 @@ def Handle_IF(code: str):
     #
     # into...
     #
-    # br i1 %CONDITON, label %if{if_num}, label %else{ifnum} | %elif{if_num}
-    global if_num
-    lines = code.splitlines()
-    has_elif = False
-    has_else = False
-    num_of_elif = 0
-    if "elif" in code: has_elif = True
-    if "else" in code: has_else = True
-    if has_elif: num_of_elif = code.count("elif")
-    elif_rest = num_of_elif
-    cond_pattern = r"^(?:if|elif)\s+(.*?)\s*:"
-    seen_if = False
-    seen_endif = False
-    for line in lines:
-
-        if line.strip().startswith("elif "):
-            elif_rest -= 1
-            is_cond = re.search(cond_pattern, line)
-            cond = ""
-            if is_cond: cond = is_cond.group(1)
-            cond = _types_.handle_bool_expr(cond)
-            AddToCurrent(f" br label %endif{if_num}\ncheck_elif{if_num}_{elif_rest+1}:\n")
-            if elif_rest != 0: AddToCurrent(f"  br i1 {cond}, label %elif{if_num}_{elif_rest}, label %check_elif{if_num}_{elif_rest}\n")
-            elif has_else: AddToCurrent(f"  br i1 {cond}, label %elif{if_num}_{elif_rest}, label %else{if_num}\n")
-            else: AddToCurrent(f"   br i1 {cond}, label %if{if_num}, label %endif{if_num}\n")
-            AddToCurrent(f"elif{if_num}_{elif_rest}:\n")
-        elif line.strip().startswith("if ") and not seen_if:
-            seen_if = True
-            is_cond = re.search(cond_pattern, line)
-            cond = ""
-            if is_cond: cond = is_cond.group(1)
+    # br i1 %CONDITON, label %if{if_num}, label %check_elif{if_num}_N | %else{if_num} | %endif{if_num}
+    # if{if_num}: BODY, br label %endif{if_num}
+    # check_elif{if_num}_N: br i1 %CONDITION, label %elif{if_num}_{N-1}, label ...
+    # elif{if_num}_{N-1}: BODY, br label %endif{if_num}
+    # else{if_num}: BODY, br label %endif{if_num}
+    # endif{if_num}:
+    if_num = ctx.context.if_num
+    ctx.context.if_num += 1
+    num_of_elif = len(node.branches) - 1
+    labels = [f"if{if_num}"] + [f"elif{if_num}_{num_of_elif - i}" for i in range(1, num_of_elif + 1)]
+    checks = [None] + [f"check_elif{if_num}_{num_of_elif - i + 1}" for i in range(1, num_of_elif + 1)]
+    fallthrough = f"else{if_num}" if node.else_body is not None else f"endif{if_num}"
+
+    # if x == 1: .. elif x == 2: .. elif x == 3: .. on one integer is a single switch, which llc
+    # turns into a jump table or a binary search instead of one compare and branch per elif
+    cases = switch_cases(node)
+    if cases is not None:
+        llvm_type, name, values = cases
+        sym = ctx.context.symbols.lookup(name)
+        value = f"%{name}" if sym.kind == symbols.ARG else _types_.load_t(name, llvm_type)
+        targets = " ".join(f"{llvm_type} {v}, label %{label}" for v, label in zip(values, labels))
+        AddToCurrent(f"  switch {llvm_type} {value}, label %{fallthrough} [ {targets} ]\n")
+        timing.count("if chains lowered to switch")
+
+    for i, (cond, body) in enumerate(node.branches):
+        if cases is None:
+            if checks[i] is not None: AddToCurrent(f"{checks[i]}:\n")
             cond = _types_.handle_bool_expr(cond)
-            if has_elif: AddToCurrent(f"    br i1 {cond}, label %if{if_num}, label %check_elif{if_num}_{elif_rest}\n")
-            elif not has_else: AddToCurrent(f"  br i1 {cond}, label %if{if_num}, label %endif{if_num}\n")
-            else: AddToCurrent(f"   br i1 {cond}, label %if{if_num}, label %else{if_num}\n")
-            AddToCurrent(f"if{if_num}:\n")
-        elif line.strip().startswith(f"else:"):
-            AddToCurrent(f"    br label %endif{if_num}\nelse{if_num}:\n")
-        elif line.strip().startswith("endif "):
-            seen_endif = True
-            AddToCurrent(f"    br label %endif{if_num}\nendif{if_num}:\n")
-            return
-        else:
-            code_ = parsing.parse_line_tool(line)
-            if not code_ is None and code != "": AddToCurrent(code_ + "\n")
-    if not seen_endif: AddToCurrent(f"    br label %endif{if_num}\nendif{if_num}:\n")
-    return
-
-
-
-
-def generate_ir(code: str, ll_path: str, save: bool):
-    instruct = False
-    struct_content = ""
-    lines = code.splitlines()
-    pc = 0
-    struct_name = ""
-    funtion_name = ""
-    ret_type = ""
-    args = {}
-    in_func = False
-    func_body_current = ""
-    in_if = False
-    if_body_current = ""
-    while pc < len(lines):
-        ctx.context.lineN = pc + 1
-        ctx.context.line_content = lines[pc]
-        line = lines[pc]
-
-        if line.strip().startswith("endif"):
-            if_body_current += line.strip().replace("    ", "") + "\n"
-            pc += 1
-
-            Handle_IF(if_body_current)
-            if_body_current = ""
-            in_if = False
-
-        elif in_if:
-            if_body_current += line.strip().replace("    ", "") + "\n"
-            pc += 1
-        
-        elif line.strip() == "":
-            pc += 1
-
-        elif line.strip().endswith("endfn"):
-            ctx.context.functions[funtion_name] = [functions.Funtion(funtion_name, args=args, ret_type=ret_type, body=func_body_current), False]
-            ctx.context.functions[funtion_name][0].COOK()
-            func_body_current = ""
-            in_func = False
-            pc += 1
-
-        elif in_func:
-            func_body_current += line.strip().replace("    ", "") + "\n"
-            pc += 1
-
-        
-        elif line.strip().startswith("unsafe"):
-            ctx.context.unsafe_mode = True
-            pc += 1
-        elif line.strip().startswith("safe"):
-            ctx.context.unsafe_mode = False
-            pc += 1
-        elif line.strip().startswith("#"):
-            pc += 1
-        elif line.strip().startswith("d_if") or line.strip().startswith("d_elif") or line.strip().startswith("d_endif") or line.strip().startswith("d_else"):
-            pc += 1
-            # ==== STRUCTS ====
-        elif line.strip().startswith("struct "):
-            # syntax:
-            # struct StructName:
-            #     field1: type1,
-            #     field2: type2,
-            #     ...
-            # endstruct
-            #
-            # turns into... 
-            #
-            # %StructName = type { type1, type2, ... }
-            toks = line.strip().split(" ")
-            struct_name = toks[1].replace(":", "").strip()
-            instruct = True
-            pc += 1
-
-            struct_content = f"%{struct_name} = type {{ "
-        elif line.strip().startswith("endstruct"):
-            struct_content = struct_content.replace("{  ,", "{ ") + " }\n"
-            ctx.context.pre_entry += struct_content
-            ctx.context.structs[struct_name] = structs.llvm_struct_to_Vox_struct(struct_content)
-            instruct = False
-            pc += 1
-
-        elif instruct:
-            regex_to_strip = re.compile("\\s*([A-Za-z]+): ")
-            type_ = _types_.llvm_numbers[regex_to_strip.sub("", line).replace(",", "").strip()]
-            struct_content += f" ,{type_}"
-            pc += 1
-
-        # === FUNCTION DEFINITIONS ===
-        elif line.strip().startswith("fn "):
-            # syntax:
-            # fn RET_TYPE FUNC_NAME(ARG1_NAME: ARG1_TYPE, ARG2_NAME: ARG2_TYPE, ...):
-            #     body
-            # endfn
-            #
-            # turns into...
-            #
-            # define i32 @FUNC_NAME(ARG1_TYPE ARG1_NAME, ARG2_TYPE ARG2_NAME, ...) {
-            #     body
-            # }
-            toks = line.strip().replace("fn ", "").replace("(", " ").replace(")", " ").replace(":", " ").replace(",", "").split(" ")
-            # toks => RET_TYPE FUNC_NAME ARG1_NAME ARG1_TYPE ARG2_NAME ARG2_TYPE ...
-            funtion_name = toks[1]
-            ret_type = toks[0]
-            args = getArgs(toks)
-            in_func = True
-            pc += 1
-
-        # ======= if  ====== #
-        elif line.strip().startswith("if "):
-            in_if = True
-            if_body_current += line.strip().replace("    ", "") + "\n"
-
-            
-        else:
-            parsing.parse_line(line)
-            pc += 1
-
-    if not ctx.context.has_errors:
-        with open(ll_path, "w", encoding="utf-8") as f:
-            f.write(ctx.context.imports)
-            f.write(ctx.context.pre_entry)
-            f.write(ctx.context.Vmain_header)
-            f.write(ctx.context.Vmain)
-            f.write(ctx.context.Vmain_exit)
-        functions.write_functions(ll_path)
-        print(f"Generated LLVM IR at '{ll_path}'")
-        print(f"{ctx.context.Vmain_header}{ctx.context.Vmain}{ctx.context.Vmain_exit}")
+            false_label = checks[i + 1] if i + 1 < len(checks) else fallthrough
+            AddToCurrent(f"  br i1 {cond}, label %{labels[i]}, label %{false_label}\n")
+        AddToCurrent(f"{labels[i]}:\n")
+        ctx.context.symbols.push(symbols.BLOCK, labels[i])
+        parsing.parse_body(body, scope)
+        ctx.context.symbols.pop()
+        AddToCurrent(f"  br label %endif{if_num}\n")
+    if node.else_body is not None:
+        AddToCurrent(f"else{if_num}:\n")
+        ctx.context.symbols.push(symbols.BLOCK, f"else{if_num}")
+        parsing.parse_body(node.else_body, scope)
+        ctx.context.symbols.pop()
+        AddToCurrent(f"  br label %endif{if_num}\n")
+    AddToCurrent(f"endif{if_num}:\n")
+
+def loop_bound(text: str) -> str:
+    """i32 value of a for range bound: a literal or folded const, an int arg, or a load of an int var/const."""
+    value = case_value(text)
+    if value is not None: return str(value)
+    sym = ctx.context.symbols.lookup(text)
+    if sym is None or sym.kind not in (symbols.VAR, symbols.CONST, symbols.ARG) or _types_.llvm_numbers.get(sym.type) != "i32":
+        errors.err(f"Range bound '{text}' must be an int literal, const, var or argument")
+        return "0"
+    if sym.kind == symbols.ARG: return f"%{text}"
+    return _types_.load_t(text, "i32")
+
+def Handle_WHILE(node: nodes.While, scope: str):
+    # while COND:
+    #     BODY
+    # endwhile
+    #
+    # into a loop the current block enters (the preheader) and the end of BODY closes (the latch)
+    #
+    # br label %while{n}
+    # while{n}: br i1 %COND, label %while{n}_body, label %endwhile{n}
+    # while{n}_body: BODY, br label %while{n}
+    # endwhile{n}:
+    n = ctx.context.loop_num
+    ctx.context.loop_num += 1
+    AddToCurrent(f"  br label %while{n}\nwhile{n}:\n")
+    cond = _types_.handle_bool_expr(node.cond)
+    AddToCurrent(f"  br i1 {cond}, label %while{n}_body, label %endwhile{n}\nwhile{n}_body:\n")
+    ctx.context.symbols.push(symbols.BLOCK, f"while{n}")
+    ctx.context.loop_depth += 1
+    parsing.parse_body(node.body, scope)
+    ctx.context.loop_depth -= 1
+    ctx.context.symbols.pop()
+    AddToCurrent(f"  br label %while{n}\nendwhile{n}:\n")
+
+def Handle_FOR(node: nodes.For, scope: str):
+    # for NAME in START..STOP:
+    #     BODY
+    # endfor
+    #
+    # into...
+    #
+    # (preheader) store i32 START, i32* %NAME.for{n}, STOP evaluated once, br label %for{n}
+    # for{n}: %i = load, br i1 (icmp slt i32 %i, STOP), label %for{n}_body, label %endfor{n}
+    # for{n}_body: BODY, br label %for{n}_latch
+    # for{n}_latch: %i.next = add nsw i32 %i, 1, store, br label %for{n}
+    # endfor{n}:
+    #
+    # NAME lives in an entry block alloca, mem2reg turns it into a phi in the header
+    n = ctx.context.loop_num
+    ctx.context.loop_num += 1
+    start, stop = loop_bound(node.start), loop_bound(node.stop)
+    slot = utils.ScopeIR(ctx.context.current_function).alloca(f"{node.var}.for{n}", "i32")
+    AddToCurrent(f"  store i32 {start}, i32* {slot}\n  br label %for{n}\nfor{n}:\n")
+    i = tmp_var()
+    cond = tmp_var()
+    AddToCurrent(f"  {i} = load i32, i32* {slot}\n  {cond} = icmp slt i32 {i}, {stop}\n")
+    AddToCurrent(f"  br i1 {cond}, label %for{n}_body, label %endfor{n}\nfor{n}_body:\n")
+    ctx.context.symbols.push(symbols.BLOCK, f"for{n}")
+    ctx.context.symbols.define(node.var, symbols.VAR, "int").addr = slot
+    ctx.context.loop_depth += 1
+    parsing.parse_body(node.body, scope)
+    ctx.context.loop_depth -= 1
+    ctx.context.symbols.pop()
+    i, step = tmp_var(), tmp_var()
+    AddToCurrent(f"  br label %for{n}_latch\nfor{n}_latch:\n")
+    AddToCurrent(f"  {i} = load i32, i32* {slot}\n  {step} = add nsw i32 {i}, 1\n  store i32 {step}, i32* {slot}\n")
+    AddToCurrent(f"  br label %for{n}\nendfor{n}:\n")
+
+def Handle_STRUCT(node: nodes.Struct):
+    # syntax:
+    # struct StructName:
+    #     field1: type1,
+    #     field2: type2,
+    #     ...
+    # endstruct
+    #
+    # turns into...
+    #
+    # %StructName = type { type1, type2, ... }
+    struct_content = f"%{node.name} = type {{ "
+    for field, type_ in node.fields:
+        if type_ not in _types_.llvm_numbers:
+            errors.err(f"Unknown type '{type_}' for field '{field}' of struct '{node.name}'")
+            continue
+        struct_content += f" ,{_types_.llvm_numbers[type_]}"
+    struct_content = struct_content.replace("{  ,", "{ ") + " }\n"
+    ctx.context.module.add_type(struct_content)
+    ctx.context.symbols.define(node.name, symbols.STRUCT, node.name, structs.llvm_struct_to_Vox_struct(struct_content))
+
+def Handle_FN(node: nodes.Fn):
+    # syntax:
+    # fn RET_TYPE FUNC_NAME(ARG1_NAME: ARG1_TYPE, ARG2_NAME: ARG2_TYPE, ...):
+    #     body
+    # endfn
+    #
+    # turns into...
+    #
+    # define i32 @FUNC_NAME(ARG1_TYPE ARG1_NAME, ARG2_TYPE ARG2_NAME, ...) {
+    #     body
+    # }
+    func = functions.Funtion(node.name, args=node.args, ret_type=node.ret_type, body=node.body)
+    ctx.context.functions[node.name] = [func, False]
+    if from_import(node):
+        func.lazy = True  # cooked by functions.lower_pending() if the program calls it
     else:
-        print(f"{consts.RED_ESCAPE}Aborting due to errors{consts.RESET_ESCAPE}")
-        sys.exit(1)
-        
-
-def compile(code: str, output_obj: str, mode: str, os: str, dialect: str = "inteldialect"):
+        func.COOK()
+
+def from_import(node: nodes.Node) -> bool:
+    """The node comes from a file the preprocessor inlined, not from the unit's own source."""
+    origins = ctx.context.line_origins
+    if not 0 < node.line <= len(origins): return False
+    return origins[node.line - 1][0] != ctx.context.source_path
+
+
+def generate_ir(code: str, ll_path: str, save: bool, source_name: str = ""):
+    with timing.phase("front end"):
+        program = frontend.parse_program(code)
+    with timing.phase("lowering"):
+        parsing.parse_body(program)
+        functions.lower_pending()
+    _libs_.check_dyn_imports()
+
+    # the IR is written even when errors were reported, Voxy.py stops before llc and ld on errors.exit_code
+    timing.count("IR instructions", ctx.context.module.vmain.instruction_count()
+                 + sum(func.ir.instruction_count() for func, is_extern in ctx.context.functions.values() if not is_extern))
+    timing.count("string pool entries", len(ctx.context.module.string_pool))
+    timing.count("string pool bytes", sum(int(t[1:t.index(" ")]) for _, t in ctx.context.module.strings.values()))
+    # single streaming pass over the IR builder
+    with timing.phase("write IR"), open(ll_path, "w", encoding="utf-8") as f:
+        if source_name: f.write(f"source_filename = \"{source_name}\"\n")
+        f.write(ctx.context.imports)
+        ctx.context.module.write_globals(f)
+        f.write(ctx.context.Vmain_header)
+        ctx.context.module.vmain.write(f)
+        f.write(ctx.context.Vmain_exit)
+        functions.write_functions(f)
+    log.info(f"Generated LLVM IR at '{ll_path}'")
+    if log.level >= log.TRACE:
+        sys.stdout.write(ctx.context.Vmain_header)
+        ctx.context.module.vmain.write(sys.stdout)
+        sys.stdout.write(ctx.context.Vmain_exit)
+
+def compile(code: str, output_obj: str, mode: str, os: str, dialect: str = "inteldialect", arch: str = "64", use_cache: bool = True, source_name: str = ""):
     """
     Top-level compile: generate IR, run llc to get object, and return ctx.context.libs_to_link for the caller
     to perform linking (so you can link against kernel32/user32 etc without libc).
     - output_obj should be a path like 'main.obj' or 'main.o' depending on your platform.
     - mode and os_target are preserved for compatibility but not assumed by this generator.
+    - with use_cache an unchanged program (source, imports, ifdefs, target) is restored from cache.CACHE_DIR
+      without running the preprocessor or the front end.
     """
     global asm_dialect
     asm_dialect = dialect
-    print("Compiling...")
+    log.info("Compiling...")
     # produce .ll path adjacent to output_obj
     if output_obj.endswith(".o") or output_obj.endswith(".obj"):
         ll_path = output_obj.rsplit(".",1)[0] + ".ll"
     else:
         ll_path = output_obj + ".ll"
-    generate_ir(preproc.PreProcess(code), ll_path, save=True)
-    return ctx.context.libs_to_link
 
+    key = cache.make_key(source_name + "\0" + code, os, arch, dialect)
+    if use_cache:
+        with timing.phase("cache lookup"):
+            meta = cache.lookup(key)
+        if meta is not None:
+            cache.restore(key, ll_path)
+            ctx.context.libs_to_link = meta["libs"]
+            resolver.record(meta.get("graph", {}))
+            log.info(f"Restored LLVM IR at '{ll_path}' from cache")
+            return ctx.context.libs_to_link
+
+    with timing.phase("preprocess"):
+        preprocessed = preproc.PreProcess(code, source_name)
+    resolver.record(ctx.context.import_graph)
+    with timing.phase("generate_ir"):
+        generate_ir(preprocessed, ll_path, save=True, source_name=source_name)
+    if use_cache and ctx.context.exit_code == 0:  # a failed compile must not come back as a clean one
+        with timing.phase("cache store"):
+            cache.store(key, preprocessed, ll_path)
+    return ctx.context.libs_to_link
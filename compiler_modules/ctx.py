@@ -1,3 +1,6 @@
+import compiler_modules.ir as ir
+import compiler_modules.symbols as symbols
+
 class DefStack:
     def __init__(self):
         self.stack = []
@@ -15,33 +18,47 @@ class DefStack:
 
 class CompilerContext:
     def __init__(self):
-        self.const_map = {}  # name: [type, value]
-        self.var_map = {}  # name: type
+        self.symbols = symbols.SymbolTable()  # consts, vars, args, structs and aliases by scope
         self.functions = {}  # name: [Funtion, is_extern]
         self.libs_to_link = []  #
-        self.Vmain = ""  #
-        self.pre_entry = ""  #
-        self.asm_mode = False  #
+        self.module = ir.IRModule()  ## types, globals, declarations and Vmain
         self.unsafe_mode = False  #
-        self.lineN = 0  #
+        self.lineN = 0  ## line in the preprocessed text
+        self.line_origins = []  ## (file, line) of every preprocessed line, see errors.Location
+        self.source_path = ""  ## file the preprocessor started from, lines from anywhere else were imported
         self.line_content = ""  #
         self.ifdef_defs = []  #
         self.fn_call_num = 0
         self.ptr_count = 0  #
-        self.has_errors = False  #
         self.exit_code = 0  #
         self.imports = ""  #
         self.Vmain_exit = "\n  ret i32 0\n}\n"  #
-        self.Vmain_header = "define i32 @Vmain( ) {\nentry:\n"  #
+        self.Vmain_header = "define i32 @Vmain( ) {\n"  #
         self.asm_dialect = ""  #
         self.current_function = None  ## None => in Vmain scope
-        self.structs = {}  ## name: VoxStruct
-        self.aliases = {}  ## name: Type
-        self.in_dyn_fn_import = False
-        self.current_dyn_fn_import = ""
         self.def_stack = DefStack()
         self.current_PRE = ""
         self.if_num = 0
+        self.loop_num = 0  ## while/for counter for block labels
+        self.loop_depth = 0  ## loops the code being lowered is in, their locals get allocas in Vmain too
+        self.import_probes = {}  ## abs path: sha256 | None, every file the preprocessor tried to read
+        self.stub_files = []  ## stub archives HandleDynLib relies on
+        self.lib_exports = {}  ## name: elfread.DynSymbol of every lib dyn library this unit reads
+        self.libs_opaque = False  ## some library's exports are unknown, so dyn_imports are not checked
+        self.dyn_imports = []  ## (name, line) of every dyn_import fn
+        self.separate_modules = False  ## record imports instead of inlining them (see units.py)
+        self.module_imports = []  ## abs paths of modules imported by this translation unit
+        self.import_graph = {}  ## importer: {import as written: abs path | None}, see resolver.graph
+        self.extern_names = set()  ## symbols loaded from other units' stubs
+        self.extern_entries = set()  ## top level IR lines loaded from other units' stubs
+        self.pending_functions = []  ## imported Funtions called but not cooked yet, see functions.lower_pending
 
 context = CompilerContext()
+
+def reset():
+    """Start a fresh translation unit, keeping the target ifdefs found by preproc."""
+    global context
+    ifdef_defs = context.ifdef_defs
+    context = CompilerContext()
+    context.ifdef_defs = ifdef_defs
 _llvm_id_counter = 0
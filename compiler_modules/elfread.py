@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+
+# Reader for the dynamic symbol table of ELF shared libraries.
+# The file is memory mapped and .dynsym/.dynstr are walked in place, together with the GNU symbol
+# versioning sections, so listing a library's exports needs no nm process and no text parsing.
+# Results are cached per file by (path, size, mtime).
+
+SHT_DYNSYM = 11
+SHT_GNU_VERDEF = 0x6ffffffd
+SHT_GNU_VERNEED = 0x6ffffffe
+SHT_GNU_VERSYM = 0x6fffffff
+SHN_UNDEF = 0
+SHN_ABS = 0xfff1
+
+bindings = {0: "LOCAL", 1: "GLOBAL", 2: "WEAK", 10: "UNIQUE"}
+types = {0: "NOTYPE", 1: "OBJECT", 2: "FUNC", 3: "SECTION", 4: "FILE", 5: "COMMON", 6: "TLS", 10: "IFUNC"}
+function_types = ("FUNC", "IFUNC")
+data_types = ("OBJECT", "COMMON", "TLS")
+
+_cache = {}  # abs path: ((size, mtime ns), [DynSymbol])
+
+class ElfError(Exception):
+    pass
+
+class DynSymbol:
+    __slots__ = ("name", "binding", "type", "version", "default", "size", "defined", "absolute")
+
+    def __init__(self, name: str, binding: str, type_: str, version, default: bool, size: int, defined: bool, absolute: bool = False):
+        self.name = name
+        self.binding = binding
+        self.type = type_
+        self.version = version  # e.g. 'GLIBC_2.2.5', None for unversioned symbols
+        self.default = default  # name@@version (the one new links bind to) rather than name@version
+        self.size = size
+        self.defined = defined  # False for symbols the library itself imports
+        self.absolute = absolute  # not in any section, e.g. the GLIBC_2.2.5 marker symbols
+
+    @property
+    def is_function(self) -> bool:
+        return self.type in function_types
+
+    def __repr__(self):
+        at = "" if self.version is None else ("@@" if self.default else "@") + self.version
+        return f"DynSymbol({self.binding} {self.type} {self.name}{at})"
+
+class _Elf:
+    def __init__(self, data):
+        if data[:4] != b"\x7fELF": raise ElfError("not an ELF file")
+        self.data = data
+        self.is64 = data[4] == 2
+        self.end = "<" if data[5] == 1 else ">"
+        if self.is64:
+            shoff, = struct.unpack_from(self.end + "Q", data, 0x28)
+            shentsize, shnum = struct.unpack_from(self.end + "HH", data, 0x3A)
+            shdr = self.end + "IIQQQQIIQQ"
+        else:
+            shoff, = struct.unpack_from(self.end + "I", data, 0x20)
+            shentsize, shnum = struct.unpack_from(self.end + "HH", data, 0x2E)
+            shdr = self.end + "IIIIIIIIII"
+        if shoff == 0 or shnum == 0: raise ElfError("no section headers")
+        # (type, offset, size, link, info, entsize)
+        self.sections = []
+        for i in range(shnum):
+            _, sh_type, _, _, offset, size, link, info, _, entsize = struct.unpack_from(shdr, data, shoff + i * shentsize)
+            self.sections.append((sh_type, offset, size, link, info, entsize))
+
+    def find(self, sh_type: int):
+        for sec in self.sections:
+            if sec[0] == sh_type: return sec
+        return None
+
+    def string(self, strtab: tuple, off: int) -> str:
+        start = strtab[1] + off
+        return self.data[start:self.data.find(b"\0", start)].decode("utf-8", "replace")
+
+    def version_names(self, strtab: tuple) -> dict:
+        """versym index: version name, from both the versions the library defines and the ones it needs."""
+        names = {}
+        d = self.data
+        verdef = self.find(SHT_GNU_VERDEF)
+        if verdef is not None:
+            off = verdef[1]
+            for _ in range(verdef[4]):  # sh_info = number of entries
+                _, flags, ndx, cnt, _, aux, nxt = struct.unpack_from(self.end + "HHHHIII", d, off)
+                if cnt and not flags & 1:  # VER_FLG_BASE names the library itself
+                    name_off, = struct.unpack_from(self.end + "I", d, off + aux)
+                    names[ndx] = self.string(strtab, name_off)
+                if not nxt: break
+                off += nxt
+        verneed = self.find(SHT_GNU_VERNEED)
+        if verneed is not None:
+            off = verneed[1]
+            for _ in range(verneed[4]):
+                _, cnt, _, aux, nxt = struct.unpack_from(self.end + "HHIII", d, off)
+                aoff = off + aux
+                for _ in range(cnt):
+                    _, _, other, name_off, anext = struct.unpack_from(self.end + "IHHII", d, aoff)
+                    names[other] = self.string(strtab, name_off)
+                    if not anext: break
+                    aoff += anext
+                if not nxt: break
+                off += nxt
+        return names
+
+    def dynsym(self) -> list:
+        dynsym = self.find(SHT_DYNSYM)
+        if dynsym is None: raise ElfError("no .dynsym section")
+        _, off, size, link, _, entsize = dynsym
+        strtab = self.sections[link]
+        versym = self.find(SHT_GNU_VERSYM)
+        versions = self.version_names(strtab) if versym is not None else {}
+        out = []
+        for i in range(1, size // entsize):  # entry 0 is the null symbol
+            at = off + i * entsize
+            if self.is64:
+                name_off, info, _, shndx, _, sym_size = struct.unpack_from(self.end + "IBBHQQ", self.data, at)
+            else:
+                name_off, _, sym_size, info, _, shndx = struct.unpack_from(self.end + "IIIBBH", self.data, at)
+            version, default = None, True
+            if versym is not None:
+                vs, = struct.unpack_from(self.end + "H", self.data, versym[1] + 2 * i)
+                version = versions.get(vs & 0x7fff)
+                default = not vs & 0x8000
+            out.append(DynSymbol(self.string(strtab, name_off), bindings.get(info >> 4, str(info >> 4)),
+                                 types.get(info & 0xf, str(info & 0xf)), version, default, sym_size, shndx != SHN_UNDEF, shndx == SHN_ABS))
+        return out
+
+def read_dynsym(path: str) -> list:
+    """Every .dynsym entry of an ELF file as DynSymbol, cached until the file changes."""
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    hit = _cache.get(abs_path)
+    if hit is not None and hit[0] == stamp: return hit[1]
+    with open(abs_path, "rb") as f:
+        if st.st_size == 0: raise ElfError("empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                symbols = _Elf(data).dynsym()
+            except struct.error:
+                raise ElfError("truncated or malformed ELF file")
+    _cache[abs_path] = (stamp, symbols)
+    return symbols
+
+def exports(path: str) -> dict:
+    """name: DynSymbol of the functions and data a shared library defines for others, default versions first."""
+    out = {}
+    for sym in read_dynsym(path):
+        if not sym.defined or sym.absolute or sym.binding == "LOCAL": continue
+        if sym.type not in function_types and sym.type not in data_types: continue
+        if sym.name not in out or (sym.default and not out[sym.name].default): out[sym.name] = sym
+    return out
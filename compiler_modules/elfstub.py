@@ -0,0 +1,106 @@
+import platform
+import struct
+
+# Stub archives for lib dyn without a C compiler.
+# Builds an ELF64 relocatable object that defines every exported symbol of a shared library
+# (functions as a one instruction body in .text, data as a slot in .bss) and wraps it in an ar
+# archive with a GNU symbol index, the same thing gcc + ar produce from a C file of empty
+# functions, in one pass over the symbol list.
+
+# machine name: (e_machine, body of every stub function)
+machines = {
+    "x86_64": (62, b"\xc3"),                # ret
+    "amd64": (62, b"\xc3"),
+    "aarch64": (183, b"\xc0\x03\x5f\xd6"),  # ret
+    "arm64": (183, b"\xc0\x03\x5f\xd6"),
+}
+
+DATA_SIZE = 8  # nm does not report sizes, every data symbol gets one aligned word
+
+STT_OBJECT, STT_FUNC = 1, 2
+STB_GLOBAL = 1
+SHT_PROGBITS, SHT_SYMTAB, SHT_STRTAB, SHT_NOBITS = 1, 2, 3, 8
+SHF_WRITE, SHF_ALLOC, SHF_EXECINSTR = 1, 2, 4
+
+def supported(machine: str = None) -> bool:
+    return (machine or platform.machine()).lower() in machines
+
+class StringTable:
+    def __init__(self):
+        self.data = bytearray(b"\0")
+        self.offsets = {}
+
+    def add(self, s: str) -> int:
+        off = self.offsets.get(s)
+        if off is None:
+            off = self.offsets[s] = len(self.data)
+            self.data += s.encode("utf-8") + b"\0"
+        return off
+
+def _align(n: int, a: int) -> int:
+    return (n + a - 1) & ~(a - 1)
+
+def build_object(symbols: list, machine: str = None) -> bytes:
+    """ELF64 little endian relocatable object defining symbols, [(name, is_function)]."""
+    e_machine, body = machines[(machine or platform.machine()).lower()]
+    strtab, shstrtab = StringTable(), StringTable()
+    text = bytearray()
+    bss_size = 0
+    syms = [struct.pack("<IBBHQQ", 0, 0, 0, 0, 0, 0)]  # index 0 is the null symbol, there are no locals
+    TEXT, BSS = 1, 2  # section indexes, see sections below
+    for name, is_function in symbols:
+        if is_function:
+            value, size, shndx, kind = len(text), len(body), TEXT, STT_FUNC
+            text += body
+        else:
+            value, size, shndx, kind = bss_size, DATA_SIZE, BSS, STT_OBJECT
+            bss_size += DATA_SIZE
+        syms.append(struct.pack("<IBBHQQ", strtab.add(name), (STB_GLOBAL << 4) | kind, 0, shndx, value, size))
+    symtab = b"".join(syms)
+
+    # name, type, flags, data (None for NOBITS), size, link, info, align, entsize
+    sections = [
+        (".text", SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR, bytes(text), len(text), 0, 0, 16, 0),
+        (".bss", SHT_NOBITS, SHF_ALLOC | SHF_WRITE, None, bss_size, 0, 0, 8, 0),
+        (".note.GNU-stack", SHT_PROGBITS, 0, b"", 0, 0, 0, 1, 0),
+        (".symtab", SHT_SYMTAB, 0, symtab, len(symtab), 5, 1, 8, 24),  # link: .strtab, info: first global
+        (".strtab", SHT_STRTAB, 0, bytes(strtab.data), len(strtab.data), 0, 0, 1, 0),
+        (".shstrtab", SHT_STRTAB, 0, None, 0, 0, 0, 1, 0),  # filled in below
+    ]
+    names = [shstrtab.add(s[0]) for s in sections]
+    shstr = bytes(shstrtab.data)
+    sections[-1] = sections[-1][:3] + (shstr, len(shstr)) + sections[-1][5:]
+
+    out = bytearray(64)
+    headers = [b"\0" * 64]
+    for name_off, (name, sh_type, flags, data, size, link, info, align, entsize) in zip(names, sections):
+        offset = _align(len(out), align)
+        if data is not None:
+            out += b"\0" * (offset - len(out)) + data
+        headers.append(struct.pack("<IIQQQQIIQQ", name_off, sh_type, flags, 0, offset, size, link, info, align, entsize))
+    shoff = _align(len(out), 8)
+    out += b"\0" * (shoff - len(out)) + b"".join(headers)
+
+    ident = b"\x7fELF" + bytes([2, 1, 1, 0]) + b"\0" * 8  # 64 bit, little endian, version 1, System V
+    out[:64] = ident + struct.pack("<HHIQQQIHHHHHH", 1, e_machine, 1, 0, 0, shoff, 0, 64, 0, 0, 64,
+                                   len(headers), len(headers) - 1)
+    return bytes(out)
+
+def _member(name: str, data: bytes, mode: str) -> bytes:
+    header = f"{name:<16}{0:<12}{0:<6}{0:<6}{mode:<8}{len(data):<10}`\n".encode("ascii")
+    return header + data + (b"\n" if len(data) % 2 else b"")
+
+def build_archive(member_name: str, obj: bytes, symbols: list) -> bytes:
+    """ar archive holding one object, with the GNU symbol index ld needs to pull it in."""
+    names = b"".join(name.encode("utf-8") + b"\0" for name in symbols)
+    index_size = 4 + 4 * len(symbols) + len(names)
+    obj_offset = 8 + 60 + index_size + index_size % 2
+    index = struct.pack(f">{1 + len(symbols)}I", len(symbols), *([obj_offset] * len(symbols))) + names
+    return b"!<arch>\n" + _member("/", index, "0") + _member(member_name + "/", obj, "644")
+
+def write_stub_archive(symbols: list, output_a: str, member_name: str = "stub.o"):
+    """symbols: [(name, is_function)]"""
+    obj = build_object(symbols)
+    with open(output_a, "wb") as f:
+        f.write(build_archive(member_name, obj, [name for name, _ in symbols]))
+    return output_a
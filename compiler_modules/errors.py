@@ -2,16 +2,35 @@ import compiler_modules.consts as consts
 import compiler_modules.ctx as ctx
 import sys
 
+# the whole run, unlike ctx.context.exit_code these survive ctx.reset() between translation units
+exit_code = 0  # code of the last error reported
+count = 0      # errors reported
+
 def CurrentFunction() -> str:
     if not ctx.context.current_function is None:
         return ctx.context.current_function
     else:
         return "Vmain"
 
-def err(msg: str, code: int = 1):
-    print(consts.RED_ESCAPE + msg + consts.RESET_ESCAPE + f" (at line {ctx.context.lineN}: '{ctx.context.line_content.strip()}' and function {CurrentFunction()})", file=sys.stderr)
-    #ctx.context.has_errors = True
-    ctx.context.exit_code = code
+def Location(lineN: int) -> str:
+    """file:line of a preprocessed line, through the origins recorded by preproc.PreProcess."""
+    origins = ctx.context.line_origins
+    if 0 < lineN <= len(origins):
+        file, line = origins[lineN - 1]
+        return f"{file}:{line}" if file else f"line {line}"
+    return f"line {lineN}"
+
+def err(msg: str, code: int = 1, where: tuple = None):
+    # where = (file, line, text) for errors raised before the preprocessed text exists
+    if where is not None:
+        file, line, content = where
+        at = f"{file}:{line}" if file else f"line {line}"
+    else:
+        at, content = Location(ctx.context.lineN), ctx.context.line_content
+    print(consts.RED_ESCAPE + msg + consts.RESET_ESCAPE + f" (at {at}: '{content.strip()}' and function {CurrentFunction()})", file=sys.stderr)
+    global exit_code, count
+    ctx.context.exit_code = exit_code = code
+    count += 1
 
 def FATAL(msg: str, code: int = 1):
     err("[FATAL ERROR]: " + msg, code)
@@ -1,17 +1,133 @@
 import compiler_modules.ctx as ctx
 import compiler_modules.errors as errors
+import compiler_modules._types_ as _types_
+import ast
+import functools
+import math
+import struct
 
-def evaluate_expression(expr: str) -> str:
-    expr = expr.strip()
-    expr = expr.replace("^", "**")  # fix inplace replace
+# Constant folder for const/var initializers.
+# The expression is parsed once into a Python AST (never eval'd), identifiers are looked up in
+# the symbol table and every operation is done in the width and signedness of the target type.
+# Folded values are memoized on the constant's Symbol so referencing a constant is O(1).
+
+unsigned_types = _types_.unsigned_types
+float_types = {"float", "float64"}
+
+class NotConstant(Exception):
+    pass
+
+def int_width(type_token: str) -> int:
+    llvm_type = _types_.llvm_numbers.get(type_token, "i32")
+    return int(llvm_type[1:]) if llvm_type[1:].isdigit() else 64  # pointers fold as i64
+
+def wrap(value: int, type_token: str) -> int:
+    """Two's complement wraparound to the type's width, unsigned types stay non negative."""
+    bits = int_width(type_token)
+    value &= (1 << bits) - 1
+    if type_token not in unsigned_types and value >= 1 << (bits - 1): value -= 1 << bits
+    return value
+
+def to_float(value: float, type_token: str) -> float:
+    if type_token == "float": return struct.unpack("<f", struct.pack("<f", value))[0]  # round to f32
+    return value
+
+# the Vox type folding into each LLVM number type, same bits as every other type of that width
+llvm_type_tokens = {"i1": "bool", "i8": "char", "i16": "uint16", "i32": "int", "i64": "int64", "float": "float", "double": "float64"}
+
+def convert(value, type_token: str):
+    """A folded value as type_token, C conversions: ints wrap, floats truncate toward zero."""
+    if type_token in float_types: return to_float(float(value), type_token)
+    return wrap(int(value), type_token)
 
-    # Replace constants with their numeric values
-    for name, val in ctx.context.const_map.items():
-        # ensure val is a number
-        expr = expr.replace(name, str(val))
+@functools.lru_cache(maxsize=4096)
+def parse(expr: str) -> ast.expr:
+    # Vox spells power '^' and xor '^^'
+    expr = expr.replace("^^", "\0").replace("^", "**").replace("\0", "^")
+    return ast.parse(expr, mode="eval").body
 
+def lookup(name: str):
+    """Folded value of a constant, memoized per constant and invalidated when it is redefined."""
+    sym = ctx.context.symbols.const(name)
+    if sym is None: raise NotConstant(f"'{name}' is not a known constant")
+    text, type_token = sym.value, sym.type
+    if sym.folded is not None and sym.folded[0] == text: return sym.folded[1]
+    if type_token not in _types_.llvm_numbers or str(text).startswith(("@", "%")):
+        raise NotConstant(f"'{name}' is not a compile time number")
+    text_ = str(text)
+    if type_token in float_types and text_.lower().startswith("0x"):
+        value = struct.unpack("<d", struct.pack("<Q", int(text_, 16)))[0]  # as written by literal()
+    else:
+        value = fold(parse(text_), type_token)
+    sym.folded = (text, value)
+    return value
+
+def c_div(a: int, b: int) -> int:
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def fold(node: ast.expr, type_token: str):
+    """Value of node in type_token, NotConstant when it has none."""
+    try:
+        return _fold(node, type_token)
+    except (OverflowError, ValueError, TypeError) as e:
+        # e.g. 10.0 ^ 400.0, a float of a huge int, (-8.0) ^ 0.5 (complex)
+        raise NotConstant(f"not representable as {type_token}: {e}")
+
+def _fold(node: ast.expr, type_token: str):
+    is_float = type_token in float_types
+    norm = (lambda v: to_float(float(v), type_token)) if is_float else (lambda v: wrap(int(v), type_token))
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        if isinstance(node.value, float) and not is_float: raise NotConstant(f"float literal {node.value} in integer constant")
+        return norm(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in ("True", "False"): return norm(node.id == "True")
+        return norm(lookup(node.id))
+    if isinstance(node, ast.UnaryOp):
+        v = _fold(node.operand, type_token)
+        if isinstance(node.op, ast.USub): return norm(-v)
+        if isinstance(node.op, ast.UAdd): return v
+        if isinstance(node.op, ast.Invert) and not is_float: return norm(~v)
+        if isinstance(node.op, ast.Not): return norm(not v)
+    if isinstance(node, ast.BinOp):
+        a, b = _fold(node.left, type_token), _fold(node.right, type_token)
+        op = type(node.op)
+        if op is ast.Add: return norm(a + b)
+        if op is ast.Sub: return norm(a - b)
+        if op is ast.Mult: return norm(a * b)
+        if op in (ast.Div, ast.FloorDiv, ast.Mod):
+            if b == 0: raise NotConstant("division by zero")
+            if op is ast.FloorDiv: return norm(math.floor(a / b) if is_float else a // b)  # floors, as it always has
+            if is_float: return norm(a / b if op is ast.Div else math.fmod(a, b))
+            q = c_div(a, b)  # C semantics, rounds toward zero
+            return norm(q if op is ast.Div else a - q * b)
+        if op is ast.Pow:
+            if is_float: return norm(a ** b)
+            if b < 0: raise NotConstant("negative exponent in integer constant")
+            return norm(pow(a, b, 1 << int_width(type_token)))
+        if not is_float:
+            if op is ast.BitAnd: return norm(a & b)
+            if op is ast.BitOr: return norm(a | b)
+            if op is ast.BitXor: return norm(a ^ b)
+            if op in (ast.LShift, ast.RShift):
+                if not 0 <= b < int_width(type_token): raise NotConstant(f"shift by {b} out of range")
+                return norm(a << b if op is ast.LShift else a >> b)  # >> on the wrapped value: arithmetic when signed
+    raise NotConstant(f"unsupported expression '{ast.unparse(node)}'")
+
+def literal(value, type_token: str) -> str:
+    """LLVM spelling of a folded value."""
+    if type_token in float_types:
+        # hex double is exact, LLVM rejects decimal float constants that f32 cannot represent
+        return f"0x{struct.unpack('<Q', struct.pack('<d', value))[0]:016X}"
+    return str(value)
+
+def evaluate_expression(expr: str, type_token: str = "int") -> str:
+    expr = expr.strip()
     try:
-        result = eval(expr, {"__builtins__": None}, {})
-        return str(result)
-    except Exception as e:
+        return literal(fold(parse(expr), type_token), type_token)
+    except SyntaxError:
+        errors.err(f"Invalid constant expression '{expr}'")
+    except NotConstant as e:
         errors.err(f"Error evaluating expression '{expr}': {e}")
+    return "0"
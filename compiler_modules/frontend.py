@@ -0,0 +1,310 @@
+import compiler_modules.ctx as ctx
+import compiler_modules.errors as errors
+import compiler_modules.lexer as lexer
+import compiler_modules.nodes as nodes
+
+# preprocessor residue, already resolved by preproc.PreProcess
+preproc_keywords = {"d_if", "d_elif", "d_else", "d_endif"}
+
+openers = {"(": ")", "[": "]", "{": "}"}
+closers = {")", "]", "}"}
+
+def split_commas(toks: list) -> list[list]:
+    """Split a token list on ',' at bracket depth 0."""
+    groups = []
+    cur = []
+    depth = 0
+    for tok in toks:
+        if tok.kind == lexer.OP and tok.text in openers: depth += 1
+        elif tok.kind == lexer.OP and tok.text in closers: depth -= 1
+        if tok.kind == lexer.OP and tok.text == "," and depth == 0:
+            groups.append(cur)
+            cur = []
+        else:
+            cur.append(tok)
+    if cur: groups.append(cur)
+    return groups
+
+def find_op(toks: list, op: str, start: int = 0) -> int:
+    """Index of the first depth 0 OP token equal to op, -1 if there is none."""
+    depth = 0
+    for i in range(start, len(toks)):
+        tok = toks[i]
+        if tok.kind != lexer.OP: continue
+        if tok.text == op and depth == 0: return i
+        if tok.text in openers: depth += 1
+        elif tok.text in closers: depth -= 1
+    return -1
+
+def matching_close(toks: list, open_idx: int) -> int:
+    depth = 0
+    for i in range(open_idx, len(toks)):
+        tok = toks[i]
+        if tok.kind != lexer.OP: continue
+        if tok.text in openers: depth += 1
+        elif tok.text in closers:
+            depth -= 1
+            if depth == 0: return i
+    return -1
+
+class Parser:
+    """
+    Builds a list of nodes.* from Vox source in one pass over the token stream.
+    Statements are line oriented, blocks (fn, if, while, for, struct, ASM) end at their end keyword.
+    """
+    def __init__(self, code: str):
+        self.src = code.splitlines()
+        self.lines = lexer.split_lines(lexer.tokenize(code))
+        self.pos = 0
+        self.statements = {
+            "const": self.parse_const,
+            "var": self.parse_var,
+            "fn": self.parse_fn,
+            "struct": self.parse_struct,
+            "if": self.parse_if,
+            "while": self.parse_while,
+            "for": self.parse_for,
+            "using": self.parse_using,
+            "lib": self.parse_lib,
+            "dyn_import": self.parse_dyn_import,
+            "ASM": self.parse_asm,
+            "return": self.parse_return,
+            "lb": self.parse_label,
+            "goto": self.parse_label,
+            "ctime_print": self.parse_ctime_print,
+            "unsafe": self.parse_safety,
+            "safe": self.parse_safety,
+        }
+
+    # ---- helpers ----
+    def text(self, toks: list) -> str:
+        """Original source text spanned by toks."""
+        if not toks: return ""
+        first, last = toks[0], toks[-1]
+        if first.line == last.line:
+            return self.src[first.line - 1][first.col:last.end]
+        parts = [self.src[first.line - 1][first.col:].strip()]
+        for lineN in range(first.line + 1, last.line):
+            parts.append(self.src[lineN - 1].strip())
+        parts.append(self.src[last.line - 1][:last.end].strip())
+        return " ".join(p for p in parts if p)
+
+    def error(self, tok, msg: str):
+        ctx.context.lineN = tok.line
+        ctx.context.line_content = self.src[tok.line - 1]
+        errors.err(msg)
+
+    def node_args(self, toks: list) -> tuple:
+        return toks[0].line, toks[0].col, self.text(toks)
+
+    # ---- driver ----
+    def parse_program(self) -> list:
+        body, term = self.parse_block(())
+        return body
+
+    def parse_block(self, terminators: tuple) -> tuple:
+        """Parse statements until a line starting with one of terminators, which is left unconsumed."""
+        body = []
+        while self.pos < len(self.lines):
+            toks = self.lines[self.pos]
+            if toks[0].kind == lexer.NAME and toks[0].text in terminators:
+                return body, toks
+            node = self.parse_statement()
+            if node is not None: body.append(node)
+        return body, None
+
+    def parse_statement(self):
+        toks = self.lines[self.pos]
+        self.pos += 1
+        head = toks[0]
+        if head.kind == lexer.NAME:
+            if head.text in preproc_keywords: return None
+            handler = self.statements.get(head.text)
+            if handler is not None: return handler(toks)
+            if len(toks) >= 3 and toks[1].text == "(" and matching_close(toks, 1) == len(toks) - 1:
+                return self.parse_call(toks)
+        elif head.kind == lexer.OP and head.text == "*":
+            return self.parse_mem_write(toks)
+        self.error(head, f"Unrecognized line: {self.text(toks)}")
+        return None
+
+    # ---- statements ----
+    def parse_decl(self, toks: list, cls):
+        # const|var NAME: TYPE = VALUE
+        if len(toks) < 4 or toks[1].kind != lexer.NAME or toks[2].text != ":":
+            self.error(toks[0], f"Expected '{toks[0].text} NAME: TYPE = VALUE'")
+            return None
+        eq = find_op(toks, "=", 3)
+        if eq == -1:
+            return cls(*self.node_args(toks), toks[1].text, self.text(toks[3:]), "")
+        return cls(*self.node_args(toks), toks[1].text, self.text(toks[3:eq]), self.text(toks[eq + 1:]))
+
+    def parse_const(self, toks): return self.parse_decl(toks, nodes.Const)
+    def parse_var(self, toks): return self.parse_decl(toks, nodes.Var)
+
+    def parse_params(self, toks: list) -> list:
+        params = []
+        for group in split_commas(toks):
+            if len(group) < 3 or group[1].text != ":":
+                self.error(group[0], "Missing type for argument")
+                continue
+            params.append((group[0].text, self.text(group[2:])))
+        return params
+
+    def parse_signature(self, toks: list, start: int):
+        # RET NAME(PARAMS) starting at toks[start]
+        open_idx = find_op(toks, "(", start)
+        if open_idx < start + 2:
+            self.error(toks[0], "Invalid function declaration: missing return type or name")
+            return None
+        close_idx = matching_close(toks, open_idx)
+        if close_idx == -1:
+            self.error(toks[0], "Invalid function declaration: missing parameters")
+            return None
+        name = toks[open_idx - 1].text
+        ret_type = self.text(toks[start:open_idx - 1])
+        return name, ret_type, self.parse_params(toks[open_idx + 1:close_idx])
+
+    def parse_fn(self, toks):
+        sig = self.parse_signature(toks, 1)
+        body, term = self.parse_block(("endfn",))
+        if term is None: self.error(toks[0], "Missing 'endfn'")
+        else: self.pos += 1
+        if sig is None: return None
+        name, ret_type, params = sig
+        return nodes.Fn(*self.node_args(toks), name, ret_type, dict(params), body)
+
+    def parse_struct(self, toks):
+        name = toks[1].text if len(toks) > 1 else ""
+        fields = []
+        while self.pos < len(self.lines):
+            line = self.lines[self.pos]
+            self.pos += 1
+            if line[0].text == "endstruct":
+                return nodes.Struct(*self.node_args(toks), name, fields)
+            if line[-1].text == ",": line = line[:-1]
+            if len(line) < 3 or line[1].text != ":":
+                self.error(line[0], f"Expected 'FIELD: TYPE' in struct '{name}'")
+                continue
+            fields.append((line[0].text, self.text(line[2:])))
+        self.error(toks[0], "Missing 'endstruct'")
+        return None
+
+    def condition(self, toks: list) -> str:
+        # if|elif COND:
+        if toks[-1].text == ":": return self.text(toks[1:-1])
+        return self.text(toks[1:])
+
+    def parse_if(self, toks):
+        branches = []
+        else_body = None
+        in_else = False
+        cond = self.condition(toks)
+        while True:
+            body, term = self.parse_block(("elif", "else", "endif"))
+            if in_else: else_body = body
+            else: branches.append((cond, body))
+            if term is None:
+                self.error(toks[0], "Missing 'endif'")
+                break
+            self.pos += 1
+            if term[0].text == "endif": break
+            if in_else:
+                self.error(term[0], f"'{term[0].text}' after 'else'")
+            elif term[0].text == "elif":
+                cond = self.condition(term)
+            else:
+                in_else = True
+        return nodes.If(*self.node_args(toks), branches, else_body)
+
+    def parse_while(self, toks):
+        body, term = self.parse_block(("endwhile",))
+        if term is None: self.error(toks[0], "Missing 'endwhile'")
+        else: self.pos += 1
+        return nodes.While(*self.node_args(toks), self.condition(toks), body)
+
+    def parse_for(self, toks):
+        # for NAME in START..STOP:
+        end = len(toks) - 1 if toks[-1].text == ":" else len(toks)
+        dots = find_op(toks, "..", 3)
+        body, term = self.parse_block(("endfor",))
+        if term is None: self.error(toks[0], "Missing 'endfor'")
+        else: self.pos += 1
+        if len(toks) < 6 or toks[1].kind != lexer.NAME or toks[2].text != "in" or dots in (-1, 3, end - 1):
+            self.error(toks[0], "Expected 'for NAME in START..STOP:'")
+            return None
+        return nodes.For(*self.node_args(toks), toks[1].text, self.text(toks[3:dots]), self.text(toks[dots + 1:end]), body)
+
+    def parse_using(self, toks):
+        # using NAME = TYPE
+        if len(toks) < 4 or toks[2].text != "=":
+            self.error(toks[0], "Expected 'using NAME = TYPE'")
+            return None
+        return nodes.Using(*self.node_args(toks), toks[1].text, self.text(toks[3:]))
+
+    def parse_lib(self, toks):
+        # lib dyn|static <LIB_NAME>|"LIB_NAME"
+        if len(toks) < 3:
+            self.error(toks[0], "Expected 'lib dyn|static <LIB_NAME>'")
+            return None
+        return nodes.Lib(*self.node_args(toks), toks[1].text, self.text(toks[2:]))
+
+    def parse_dyn_import(self, toks):
+        # dyn_import fn RET NAME(PARAM: TYPE, ...). parameters may span several lines
+        first = toks
+        toks = list(toks)
+        open_idx = find_op(toks, "(")
+        while open_idx != -1 and matching_close(toks, open_idx) == -1 and self.pos < len(self.lines):
+            toks += self.lines[self.pos]
+            self.pos += 1
+        if len(toks) < 2 or toks[1].text != "fn":
+            self.error(toks[0], "Line must start with 'dyn_import fn '")
+            return None
+        sig = self.parse_signature(toks, 2)
+        if sig is None: return None
+        name, ret_type, params = sig
+        return nodes.DynImport(*self.node_args(first), name, ret_type, params)
+
+    def parse_asm(self, toks):
+        # ASM: ... asmend:
+        lines = []
+        while self.pos < len(self.lines):
+            line = self.lines[self.pos]
+            self.pos += 1
+            if line[0].text == "asmend":
+                return nodes.Asm(*self.node_args(toks), lines)
+            lines.append(self.text(line))
+        self.error(toks[0], "Missing 'asmend:'")
+        return nodes.Asm(*self.node_args(toks), lines)
+
+    def parse_return(self, toks):
+        value = self.text(toks[1:]) if len(toks) > 1 else None
+        return nodes.Return(*self.node_args(toks), value)
+
+    def parse_label(self, toks):
+        cls = nodes.Label if toks[0].text == "lb" else nodes.Goto
+        return cls(*self.node_args(toks), self.text(toks[1:]))
+
+    def parse_ctime_print(self, toks):
+        return nodes.CtimePrint(*self.node_args(toks), self.text(toks[1:]))
+
+    def parse_safety(self, toks):
+        return nodes.Safety(*self.node_args(toks), toks[0].text == "unsafe")
+
+    def parse_call(self, toks):
+        args = [self.text(group) for group in split_commas(toks[2:-1])]
+        return nodes.Call(*self.node_args(toks), toks[0].text, args)
+
+    def parse_mem_write(self, toks):
+        # *(ADDR): TYPE = VALUE
+        close_idx = matching_close(toks, 1) if len(toks) > 1 and toks[1].text == "(" else -1
+        eq = find_op(toks, "=")
+        if close_idx == -1 or eq == -1 or close_idx + 1 >= len(toks) or toks[close_idx + 1].text != ":":
+            self.error(toks[0], "Expected '*(ADDR): TYPE = VALUE'")
+            return None
+        return nodes.MemWrite(*self.node_args(toks), self.text(toks[2:close_idx]),
+                              self.text(toks[close_idx + 2:eq]), self.text(toks[eq + 1:]))
+
+def parse_program(code: str) -> list:
+    """Tokenize and parse a whole (preprocessed) program into a list of nodes."""
+    return Parser(code).parse_program()
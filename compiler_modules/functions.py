@@ -1,15 +1,23 @@
 import compiler_modules.ctx as ctx
 import compiler_modules.parsing as parsing
 import compiler_modules._types_ as _types_
+import compiler_modules.ir as ir
+import compiler_modules.timing as timing
+import compiler_modules.log as log
+import compiler_modules.symbols as symbols
 
 class Funtion:
     def __init__(self, name: str, args: dict, ret_type: str, body: str):
         self.name = name
         self.args = args # name: type
-        self.locals = {} # name: [type, value]
-        self.ret_type = _types_.vox_type_to_llvm(ret_type)
+        self.locals = {} # name: [llvm type, alloca slot], see parsing.parse_local
+        self.ret_type = _types_.vox_type_to_llvm(ret_type)  # mapped here once, LLVM from then on
 
-        self.body = body
+        self.body = body  # list of nodes.Node, lowered by COOK()
+        self.ir = ir.IRFunction()  # lowered LLVM blocks
+        self.decl = None  # declare line of an extern, added to the module by its first call
+        self.lazy = False  # imported fn, only cooked once something calls it
+        self.referenced = False
 
     def is_arg(self, name: str) -> bool:
         return name in self.args
@@ -18,16 +26,17 @@ class Funtion:
         return self.args[name]
 
     def COOK(self):
-        print("Cooking function:", self.name)
-        print(self.body)
-        print(self.args)
-        print("endfn\n")
-        BodyCopy: str = self.body
-        self.body = ""
+        if log.level >= log.TRACE: log.trace(f"Cooking function: {self.name}\n{self.body}\n{self.args}\nendfn\n")
+        self.ir = ir.IRFunction()
+        self.locals = {}
         ctx.context.def_stack.push(self.name)
         ctx.context.current_function = self.name
-        for line in BodyCopy.split("\n"):
-            parsing.parse_line(line, scope=self.name)
+        ctx.context.symbols.push(symbols.FUNCTION, self.name)
+        for arg, type_ in self.args.items():
+            ctx.context.symbols.define(arg, symbols.ARG, type_)
+        with timing.phase("cook functions"):
+            parsing.parse_body(self.body, scope=self.name)
+        ctx.context.symbols.pop()
         ctx.context.def_stack.pop()
         ctx.context.current_function = ctx.context.def_stack.peek()
 
@@ -35,23 +44,54 @@ class Funtion:
         if self.name is None: self.name = "func"
         if self.args is None: self.args = {}
         if self.ret_type is None: self.ret_type = "void"
-        if self.body is None: self.body = "return\n"
+        if self.body is None: self.body = []
         if self.locals is None: self.locals = {}
 
 
     def add_local(self, name: str, type_: str, value: str):
         self.locals[name] = [type_, value]
 
-def write_functions(ll_path: str):
-    with open(ll_path, "a", encoding="utf-8") as f:  # <-- change "w" to "a"
-        for name, fn_pair in ctx.context.functions.items():
-            # fn_pair is [Funtion, is_extern]
-            func = fn_pair[0]
-            is_extern = fn_pair[1]
-            if is_extern: continue  # skip externals
-            f.write(f"\n; Function {func.name}\n")
-            args_str = ", ".join([f"{ _types_.llvm_numbers.get(t, 'i8*')} %{n}" for n, t in func.args.items()])
-            ret_type_llvm = _types_.llvm_numbers.get(func.ret_type, "i8*")
-            f.write(f"define {ret_type_llvm} @{func.name}({args_str}) {{\nentry:\n")
-            f.write(func.body)
-            f.write("\n}\n")
+def reference(name: str):
+    """
+    A call to name was lowered. Externs get their declaration and imported functions
+    are queued for lower_pending() the first time, so unused ones never reach the IR.
+    """
+    func, is_extern = ctx.context.functions[name]
+    if func.referenced: return
+    func.referenced = True
+    if is_extern:
+        if func.decl is not None and not ctx.context.module.has_entry(func.decl): ctx.context.module.add_declaration(func.decl)
+    elif func.lazy:
+        ctx.context.pending_functions.append(func)
+
+def lower_pending():
+    """Cook the imported functions that were called, and whatever they call in turn, after the top level is done."""
+    pending = ctx.context.pending_functions
+    while pending:
+        func = pending.pop()
+        func.COOK()
+        timing.count("imported functions lowered")
+
+def signature(func: Funtion) -> tuple[str, str]:
+    """LLVM (return type, argument list) of a defined function."""
+    args_str = ", ".join([f"{_types_.vox_type_to_llvm(t)} %{n}" for n, t in func.args.items()])
+    return func.ret_type, args_str
+
+def declaration(func: Funtion) -> str:
+    """declare line matching what write_functions defines, for other translation units."""
+    ret_type_llvm, args_str = signature(func)
+    return f"declare {ret_type_llvm} @{func.name}({args_str})"
+
+def write_functions(f):
+    """Serialize every defined function into the already open .ll stream f."""
+    for name, fn_pair in ctx.context.functions.items():
+        # fn_pair is [Funtion, is_extern]
+        func = fn_pair[0]
+        is_extern = fn_pair[1]
+        if is_extern: continue  # skip externals
+        if func.lazy and not func.referenced: continue  # imported and never called
+        f.write(f"\n; Function {func.name}\n")
+        ret_type_llvm, args_str = signature(func)
+        f.write(f"define {ret_type_llvm} @{func.name}({args_str}) {{\n")
+        func.ir.write(f)
+        f.write("}\n")
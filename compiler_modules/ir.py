@@ -0,0 +1,99 @@
+import re
+
+# a bare LLVM label line, e.g. "if0:" or "check_elif0_1:"
+label_re = re.compile(r"^[A-Za-z$._][\w$.]*:$")
+
+class BasicBlock:
+    def __init__(self, label: str):
+        self.label = label
+        self.instructions = []  # one LLVM instruction per entry, no indentation
+        self.loads = {}         # (pointer, llvm type): SSA value of a const already loaded in this block
+
+    def write(self, out):
+        out.write(f"{self.label}:\n")
+        for inst in self.instructions:
+            out.write(f"  {inst}\n")
+
+class IRFunction:
+    """
+    Body of a single LLVM function as a list of basic blocks.
+    Code is appended with emit(), a label line opens a new block.
+    """
+    def __init__(self):
+        self.blocks = [BasicBlock("entry")]
+        self.allocas = 0  # the entry block starts with this many allocas
+        self.slots = set()  # their names
+
+    def alloca(self, name: str, llvm_type: str) -> str:
+        """Add a stack slot at the top of the entry block, where mem2reg can promote it, and return it."""
+        slot = f"%{name}"
+        n = 1
+        while slot in self.slots:  # the same name declared again in another block
+            slot = f"%{name}{n}"
+            n += 1
+        self.slots.add(slot)
+        self.blocks[0].instructions.insert(self.allocas, f"{slot} = alloca {llvm_type}")
+        self.allocas += 1
+        return slot
+
+    def current_block(self) -> BasicBlock:
+        return self.blocks[-1]
+
+    def emit(self, code: str):
+        for line in code.splitlines():
+            line = line.strip()
+            if line == "": continue
+            if label_re.match(line):
+                self.blocks.append(BasicBlock(line[:-1]))
+            else:
+                self.blocks[-1].instructions.append(line)
+
+    def instruction_count(self) -> int:
+        return sum(len(block.instructions) for block in self.blocks)
+
+    def write(self, out):
+        for block in self.blocks:
+            block.write(out)
+
+class IRModule:
+    """
+    Incremental builder for a whole LLVM module.
+    Top level entries go into separate buckets and Vmain gets its own IRFunction,
+    everything is serialized once by write_globals() / IRFunction.write().
+    """
+    def __init__(self):
+        self.type_defs = []     # %Name = type { ... }
+        self.globals = []       # @name = global|constant ...
+        self.declarations = []  # declare ...
+        self.vmain = IRFunction()
+        self.entries = set()    # every top level entry, for O(1) membership checks
+        self.strings = {}       # string literal as written: (global name, array type), see intern_string
+        self.string_pool = []   # @.strN = private unnamed_addr constant ..., one per distinct literal
+
+    def _add(self, bucket: list, code: str):
+        for line in code.splitlines():
+            line = line.strip()
+            if line == "": continue
+            bucket.append(line)
+            self.entries.add(line)
+
+    def add_type(self, code: str): self._add(self.type_defs, code)
+    def add_global(self, code: str): self._add(self.globals, code)
+    def add_declaration(self, code: str): self._add(self.declarations, code)
+
+    def has_entry(self, code: str) -> bool:
+        return code.strip() in self.entries
+
+    def intern_string(self, literal: str, array_type: str, init: str):
+        """(global name, array type) of the pooled constant for literal, created on first use."""
+        entry = self.strings.get(literal)
+        if entry is None:
+            entry = self.strings[literal] = (f"@.str{len(self.strings)}", array_type)
+            self.string_pool.append(f"{entry[0]} = private unnamed_addr constant {array_type} {init}")
+        return entry
+
+    def write_globals(self, out):
+        for bucket in (self.type_defs, self.globals, self.string_pool, self.declarations):
+            for line in bucket:
+                out.write(line + "\n")
+            if bucket: out.write("\n")
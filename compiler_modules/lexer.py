@@ -0,0 +1,90 @@
+NAME = "NAME"
+NUMBER = "NUMBER"
+STRING = "STRING"
+OP = "OP"
+NEWLINE = "NEWLINE"
+EOF = "EOF"
+
+# longest first so "==" wins over "="
+multi_ops = ("==", "!=", "<=", ">=", "&&", "||", "^^", "..", "**", "//")
+
+class Token:
+    def __init__(self, kind: str, text: str, line: int, col: int):
+        self.kind = kind
+        self.text = text
+        self.line = line  # 1 based
+        self.col = col    # 0 based offset into the line
+
+    @property
+    def end(self) -> int:
+        return self.col + len(self.text)
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.text!r}, {self.line}:{self.col})"
+
+def _is_name_start(c: str) -> bool:
+    return c.isalpha() or c == "_"
+
+def _is_name_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+def tokenize(code: str):
+    """
+    Single pass tokenizer over Vox source.
+    Yields Tokens with line/column info, one NEWLINE per source line and a final EOF.
+    '#' starts a comment that runs to the end of the line.
+    """
+    lineN = 0
+    for lineN, line in enumerate(code.splitlines(), start=1):
+        i = 0
+        n = len(line)
+        while i < n:
+            c = line[i]
+            if c.isspace():
+                i += 1
+            elif c == "#":
+                break
+            elif _is_name_start(c):
+                j = i + 1
+                while j < n and _is_name_char(line[j]): j += 1
+                yield Token(NAME, line[i:j], lineN, i)
+                i = j
+            elif c.isdigit():
+                j = i + 1
+                while j < n and (line[j].isalnum() or line[j] == "_"): j += 1
+                # fraction, but not a ".." range
+                if j + 1 < n and line[j] == "." and line[j + 1].isdigit():
+                    j += 1
+                    while j < n and line[j].isdigit(): j += 1
+                yield Token(NUMBER, line[i:j], lineN, i)
+                i = j
+            elif c == '"':
+                j = i + 1
+                while j < n and line[j] != '"':
+                    if line[j] == "\\": j += 1
+                    j += 1
+                j = min(j + 1, n)  # an unterminated string runs to the end of the line
+                yield Token(STRING, line[i:j], lineN, i)
+                i = j
+            else:
+                op = c
+                for m in multi_ops:
+                    if line.startswith(m, i):
+                        op = m
+                        break
+                yield Token(OP, op, lineN, i)
+                i += len(op)
+        yield Token(NEWLINE, "", lineN, len(line))
+    yield Token(EOF, "", lineN + 1, 0)
+
+def split_lines(tokens) -> list[list[Token]]:
+    """Group a token stream into logical lines, dropping empty ones."""
+    lines = []
+    cur = []
+    for tok in tokens:
+        if tok.kind == NEWLINE or tok.kind == EOF:
+            if cur: lines.append(cur)
+            cur = []
+        else:
+            cur.append(tok)
+    return lines
@@ -0,0 +1,20 @@
+import sys
+
+# Leveled compiler logging. Silent apart from warnings unless Voxy.py gets --verbose or --trace.
+# Hot paths check the level before building a message, so a disabled message costs one comparison:
+#     if log.level >= log.TRACE: log.trace(f"...")
+
+WARN = 1   # default: only things the user should act on, errors go through errors.err
+INFO = 2   # --verbose: progress and summary lines
+TRACE = 3  # --trace: full dumps of preprocessed code, IR and every lowering step
+
+level = WARN
+
+def warn(msg: str):
+    if level >= WARN: print(msg, file=sys.stderr)
+
+def info(msg: str):
+    if level >= INFO: print(msg)
+
+def trace(msg: str):
+    if level >= TRACE: print(msg)
@@ -0,0 +1,84 @@
+import compiler_modules.ctx as ctx
+import compiler_modules.cache as cache
+import compiler_modules.resolver as resolver
+import json
+import os
+
+# Build manifest for make style rebuild skipping, kept next to the output as <output>.manifest.json.
+# It records every input of the last successful build with its fingerprint, split by the stage that
+# consumes it, so Voxy.py can skip the front end when no source changed and the link when no object,
+# library or flag did. A file counts as changed when its mtime or size moved and its content hash
+# differs too, so touching a file without editing it does not force a rebuild.
+
+def path_for(output: str) -> str:
+    return output + ".manifest.json"
+
+def fingerprint(path: str):
+    """[mtime ns, size, sha256] of a file, None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, cache.sha256_file(path)]
+
+def fingerprints(paths) -> dict:
+    return {os.path.abspath(p): fingerprint(p) for p in dict.fromkeys(paths)}
+
+def changed(recorded: dict) -> list:
+    """Paths in recorded whose file is not the one it describes anymore."""
+    stale = []
+    for path, old in recorded.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            if old is not None: stale.append(path)
+            continue
+        if old is None: stale.append(path)
+        elif [st.st_mtime_ns, st.st_size] == old[:2]: continue
+        elif st.st_size != old[1] or cache.sha256_file(path) != old[2]: stale.append(path)
+    return stale
+
+def front_key(*settings) -> list:
+    """Everything besides the sources that decides the generated IR."""
+    return [cache.compiler_hash(), sorted(ctx.context.ifdef_defs), *map(str, settings)]
+
+def sources(main_file: str) -> list:
+    """The main file, vox_path.json and every import the preprocessor resolved during this run."""
+    paths = [main_file, resolver.search_file]
+    for edges in resolver.graph.values():
+        paths += [p for p in edges.values() if p is not None]
+    return paths
+
+def lib_files(libs: list, search_dirs: list) -> list:
+    """Files behind -l<name> that live in search_dirs, system libraries are tracked by name in the ld command."""
+    found = []
+    for name in libs:
+        for d in search_dirs:
+            hits = [os.path.join(d, f) for f in (f"lib{name}.a", f"{name}.a", f"lib{name}.so", f"{name}.lib", f"{name}.dll")]
+            found += [h for h in hits if os.path.isfile(h)]
+    return found
+
+def load(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def front_end_current(old, key: list) -> bool:
+    """The IR from the last build can be reused as is."""
+    if old is None or old.get("front") != key: return False
+    if not all(os.path.exists(ll) for ll in old["ll_files"]): return False
+    return not changed(old["sources"])
+
+def link_current(old, ld_cmd: str, output: str) -> bool:
+    """The output binary is still what ld_cmd would produce from the current objects and libraries."""
+    if old is None or old.get("ld") != ld_cmd: return False
+    if changed({os.path.abspath(output): old["output"]}): return False
+    return not changed(old["link_inputs"])
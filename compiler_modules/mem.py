@@ -2,17 +2,20 @@ import compiler_modules.ctx as ctx
 import compiler_modules.errors as errors
 import compiler_modules._types_ as _types_
 import compiler_modules.utils as utils
+import compiler_modules.log as log
 
 def HandleMem_Write(line: list, scope: str):
-    print("Handling memory write:", line)
+    if log.level >= log.TRACE: log.trace(f"Handling memory write: {line}")
     # format: [ADDR, TYPE, VALUE]
     addr = line[0]
     _type = line[1]
     value = line [2]
-    if addr in ctx.context.const_map:
-        addr = f"@{addr}"
-    if value in ctx.context.const_map:
-        value = ctx.context.const_map[value][0]
+    if ctx.context.symbols.is_const(addr):
+        addr = ctx.context.symbols.address(addr)
+    const = ctx.context.symbols.const(value)
+    if const is not None:
+        value = const.value
+        if const.addr is not None and value == const.addr: value = _types_.load_t(const.name, _types_.vox_type_to_llvm(const.type))  # runtime initialized fn local
     if _type in _types_.llvm_numbers:
         _type = _types_.llvm_numbers[_type]
     else:
@@ -0,0 +1,134 @@
+# Typed AST produced by frontend.parse_program()
+# every node remembers where it came from (line, col) and its source text for error messages
+
+class Node:
+    def __init__(self, line: int, col: int, text: str):
+        self.line = line
+        self.col = col
+        self.text = text
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items() if k not in ("line", "col", "text"))
+        return f"{type(self).__name__}({fields})"
+
+class Const(Node):
+    # const NAME: TYPE = VALUE
+    def __init__(self, line, col, text, name: str, type_: str, value: str):
+        super().__init__(line, col, text)
+        self.name = name
+        self.type = type_
+        self.value = value
+
+class Var(Const):
+    # var NAME: TYPE = VALUE
+    pass
+
+class Fn(Node):
+    # fn RET NAME(ARG: TYPE, ...): BODY endfn
+    def __init__(self, line, col, text, name: str, ret_type: str, args: dict, body: list):
+        super().__init__(line, col, text)
+        self.name = name
+        self.ret_type = ret_type
+        self.args = args  # name: vox type
+        self.body = body  # list[Node]
+
+class Struct(Node):
+    # struct NAME: FIELD: TYPE, ... endstruct
+    def __init__(self, line, col, text, name: str, fields: list):
+        super().__init__(line, col, text)
+        self.name = name
+        self.fields = fields  # [(name, vox type)]
+
+class If(Node):
+    # if COND: BODY [elif COND: BODY]* [else: BODY] endif
+    def __init__(self, line, col, text, branches: list, else_body: list):
+        super().__init__(line, col, text)
+        self.branches = branches    # [(cond text, list[Node])], the if first
+        self.else_body = else_body  # list[Node] or None
+
+class While(Node):
+    # while COND: BODY endwhile
+    def __init__(self, line, col, text, cond: str, body: list):
+        super().__init__(line, col, text)
+        self.cond = cond
+        self.body = body  # list[Node]
+
+class For(Node):
+    # for NAME in START..STOP: BODY endfor, STOP excluded
+    def __init__(self, line, col, text, var: str, start: str, stop: str, body: list):
+        super().__init__(line, col, text)
+        self.var = var
+        self.start = start
+        self.stop = stop
+        self.body = body  # list[Node]
+
+class Call(Node):
+    # NAME(ARG, ...)
+    def __init__(self, line, col, text, name: str, args: list):
+        super().__init__(line, col, text)
+        self.name = name
+        self.args = args  # argument source texts
+
+class Using(Node):
+    # using NAME = TYPE
+    def __init__(self, line, col, text, name: str, type_: str):
+        super().__init__(line, col, text)
+        self.name = name
+        self.type = type_
+
+class Lib(Node):
+    # lib dyn|static <NAME>|"NAME"
+    def __init__(self, line, col, text, kind: str, target: str):
+        super().__init__(line, col, text)
+        self.kind = kind
+        self.target = target
+
+class DynImport(Node):
+    # dyn_import fn RET NAME(PARAM: TYPE, ...).
+    def __init__(self, line, col, text, name: str, ret_type: str, params: list):
+        super().__init__(line, col, text)
+        self.name = name
+        self.ret_type = ret_type
+        self.params = params  # [(name, vox type)]
+
+class Asm(Node):
+    # ASM: LINES asmend:
+    def __init__(self, line, col, text, lines: list):
+        super().__init__(line, col, text)
+        self.lines = lines  # raw assembly lines
+
+class Return(Node):
+    # return [VALUE]
+    def __init__(self, line, col, text, value: str):
+        super().__init__(line, col, text)
+        self.value = value  # None for a bare return
+
+class Label(Node):
+    # lb NAME
+    def __init__(self, line, col, text, name: str):
+        super().__init__(line, col, text)
+        self.name = name
+
+class Goto(Label):
+    # goto NAME
+    pass
+
+class CtimePrint(Node):
+    # ctime_print ARGS
+    def __init__(self, line, col, text, args: str):
+        super().__init__(line, col, text)
+        self.args = args
+
+class MemWrite(Node):
+    # *(ADDR): TYPE = VALUE
+    def __init__(self, line, col, text, addr: str, type_: str, value: str):
+        super().__init__(line, col, text)
+        self.addr = addr
+        self.type = type_
+        self.value = value
+
+class Safety(Node):
+    # unsafe | safe
+    def __init__(self, line, col, text, unsafe: bool):
+        super().__init__(line, col, text)
+        self.unsafe = unsafe
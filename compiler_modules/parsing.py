@@ -1,17 +1,25 @@
 import compiler_modules.ctx as ctx
 import compiler_modules._types_ as _types_
-import re
 import compiler_modules.errors as errors
 import compiler_modules.structs as structs
 import compiler_modules._libs_ as _libs_
 import compiler_modules.evals as evals
 import compiler_modules.utils as utils
+import compiler_modules.log as log
 import compiler_modules.mem as mem
 import compiler_modules.compy as compy
+import compiler_modules.nodes as nodes
+import compiler_modules.symbols as symbols
+import compiler_modules.functions as functions
+import compiler_modules.timing as timing
+import re
+
+asm_word_re = re.compile(r"[A-Za-z_][\w]*")
+escape_re = re.compile(r"\\[0-9A-Fa-f]{2}")
 
 def parse_struct_const(name: str, type_token: str, value: str):
     # const NAME: StructName = StructName { val1, val2, ... } or { key: val, ... }
-    struct_def: structs.VoxStruct = ctx.context.structs[type_token]
+    struct_def: structs.VoxStruct = ctx.context.symbols.struct(type_token)
     field_types = struct_def.get_feild_types()  # typo corrected
 
     # Strip the struct name and outer braces
@@ -66,20 +74,78 @@ def parse_struct_const(name: str, type_token: str, value: str):
 def parse_struct_var(name: str, type_token: str, value: str):
     return parse_struct_const(name, type_token, value).replace("constant ", "global ")
 
+def is_call(value: str) -> bool:
+    return isinstance(value, str) and "(" in value and value.strip().endswith(")")
+
+def is_local_scope() -> bool:
+    return ctx.context.current_function is not None or ctx.context.loop_depth > 0
+
+def parse_local(name: str, type_token: str, value: str, kind: str):
+    """
+    var/const of a number or pointer type inside a fn body or a loop body: an alloca slot at the top
+    of the entry block (tracked in Funtion.locals in fns) and a store of the initializer where the
+    declaration is, so a loop runs the initializer on every iteration in Vmain as well.
+    Returns False for types that stay module globals (buffers and structs).
+    """
+    table = ctx.context.symbols
+    if type_token in _types_.llvm_numbers:
+        llvm_type = _types_.llvm_numbers[type_token]
+        if type_token == "bool": value = _types_.handle_bool(value)
+        if is_call(value):
+            init = compy.tmp_var()
+            utils.AddToScope(f"  {init} = {parseFunctionCallS(value, retT=llvm_type)}\n", ctx.context.current_function)
+        else:
+            value = init = evals.evaluate_expression(value, type_token)
+    elif type_token.startswith("ptr"):
+        base_type = type_token.replace("ptr[", "").replace("]", "")
+        if base_type not in _types_.llvm_numbers:
+            errors.err(f"Unknown base type '{base_type}' for pointer variable '{name}'")
+            return True
+        llvm_type = f"{_types_.llvm_numbers[base_type]}*"
+        if value.startswith("addr "):
+            ref_name = value[5:].strip()
+            ref = table.lookup(ref_name)
+            if ref is None:
+                errors.err(f"Unknown reference '{ref_name}' for pointer variable '{name}'")
+                return True
+            init = table.address(ref_name)
+            if ref.type.startswith("buff"):
+                base, size = _types_.parse_buff_type(ref.type)
+                elem = _types_.llvm_numbers.get(base, "i8")
+                if elem != llvm_type[:-1] and not ctx.context.unsafe_mode:
+                    errors.err(f"Type mismatch in getelementptr: buffer base type '{base}' vs pointer base type '{base_type}'")
+                gep = compy.tmp_var()
+                utils.AddToScope(f"  {gep} = getelementptr [{size} x {elem}], [{size} x {elem}]* {init}, i32 0, i32 0\n", ctx.context.current_function)
+                init = gep
+        else:
+            init = f"inttoptr (i64 {value} to {llvm_type})"
+    else:
+        return False
+
+    slot = utils.ScopeIR(ctx.context.current_function).alloca(f"{name}.addr", llvm_type)
+    if ctx.context.current_function is not None:
+        ctx.context.functions[ctx.context.current_function][0].add_local(name, llvm_type, slot)
+    utils.AddToScope(f"  store {llvm_type} {init}, {llvm_type}* {slot}\n", ctx.context.current_function)
+    # a folded const keeps its value for evals and call arguments, a runtime one only has its slot
+    folded = kind == symbols.CONST and type_token in _types_.llvm_numbers and not is_call(value)
+    sym = table.define(name, kind, type_token.strip(), value.strip() if folded else slot)
+    sym.addr = slot
+    return True
+
 def parse_const(name: str, type_token: str, value: str) -> str:
     # @NAME = constant LLVM_T VALUE
+    if is_local_scope() and parse_local(name, type_token, value, symbols.CONST): return ""
     llvm_type = _types_.vox_type_to_llvm(type_token)
     pre_val = ""
-    struct_names = list(ctx.context.structs.keys())
     if type_token in _types_.llvm_numbers:
         llvm_type = _types_.llvm_numbers[type_token]
         if type_token == "bool":
             value = _types_.handle_bool(value)
         # If value looks like a runtime call (e.g., GetStdHandle(...)) don't try to eval it here.
         if not (isinstance(value, str) and "(" in value and value.strip().endswith(")")):
-            value = evals.evaluate_expression(value)
+            value = evals.evaluate_expression(value, type_token)
         
-    elif type_token in struct_names:
+    elif ctx.context.symbols.struct(type_token) is not None:
         return parse_struct_const(name, type_token, value)
 
     elif type_token.startswith("buff"):
@@ -107,9 +173,10 @@ def parse_const(name: str, type_token: str, value: str) -> str:
 
         const_val = ""
         const_t = ""
-        if value.replace("addr ", "").strip() in ctx.context.const_map:
-            const_val = ctx.context.const_map[value.replace("addr ", "").strip()][0]
-            const_t = ctx.context.const_map[value.replace("addr ", "").strip()][1]
+        ref = ctx.context.symbols.const(value.replace("addr ", "").strip())
+        if ref is not None:
+            const_val = ref.value
+            const_t = ref.type
 
         if value.startswith("addr "):
             if const_t.startswith("buff"): return _types_.HandleGetElementPtr(name,base_type, value)
@@ -117,7 +184,7 @@ def parse_const(name: str, type_token: str, value: str) -> str:
         else:
             return f"@{name} = constant {llvm_type} inttoptr (i64 {value} to i32*)\n"
     else:
-        errors.err(f"Unknown type '{type_token}' for variable '{name}' not in vox numbers or a struct: {ctx.context.structs}")
+        errors.err(f"Unknown type '{type_token}' for variable '{name}' not in vox numbers or a struct")
     # Handle runtime-initialized constants (e.g., GetStdHandle(...)) by creating
     # a zero-initialized global and emitting a runtime init sequence in Vmain.
     if "(" in value and value.strip().endswith(")"):
@@ -125,28 +192,29 @@ def parse_const(name: str, type_token: str, value: str) -> str:
         func_name = value[:value.find("(")].strip()
         inner = value[value.find("(")+1:-1].strip()
         inner_val = inner
-        if inner in ctx.context.const_map:
-            inner_val = ctx.context.const_map[inner][0]
+        inner_const = ctx.context.symbols.const(inner)
+        if inner_const is not None:
+            inner_val = inner_const.value
         # add zero-initialized global
-        if not f"@{name} = global {llvm_type} zeroinitializer\n" in ctx.context.pre_entry: ctx.context.pre_entry += f"@{name} = global {llvm_type} zeroinitializer\n"
+        if not ctx.context.module.has_entry(f"@{name} = global {llvm_type} zeroinitializer"): ctx.context.module.add_global(f"@{name} = global {llvm_type} zeroinitializer")
         # emit runtime init in Vmain: call the function with properly-typed literal
         # try to format inner_val: if it's an integer literal, use as-is, else if it's a global ref (@name)
         formatted_inner = inner_val
-        # if inner_val is numeric string, keep; if startswith('@') use as is; otherwise if it's a bare name and exists in const_map, use its stored value
-        if inner in ctx.context.const_map:
-            formatted_inner = ctx.context.const_map[inner][0]
-        # choose literal formatting: assume parameter is i32 unless const_map gives type
+        # if inner_val is numeric string, keep; if startswith('@') use as is; otherwise if it's a bare name of a constant, use its stored value
+        if inner_const is not None:
+            formatted_inner = inner_const.value
+        # choose literal formatting: assume parameter is i32 unless the constant gives a type
         param_str = formatted_inner
         tmp = f"%tmp_init{ctx.context.fn_call_num}"
         ctx.context.fn_call_num += 1
         utils.AddToScope(f"  {tmp} = {parseFunctionCallS(value, retT=llvm_type)}\n", ctx.context.current_function)
         utils.AddToScope(f"  store {llvm_type} {tmp}, {llvm_type}* @{name}\n", ctx.context.current_function)
         # Register constant as a reference to the global we created
-        ctx.context.const_map[name] = [f"@{name}", type_token.strip()]
+        ctx.context.symbols.define(name, symbols.CONST, type_token.strip(), f"@{name}")
         return ""
 
     # Normal constant: register and emit
-    ctx.context.const_map[name] = [value.strip(), type_token.strip()]
+    ctx.context.symbols.define(name, symbols.CONST, type_token.strip(), value.strip())
     return f"@{name} = constant {llvm_type} {pre_val}{value}\n"
 
 def parse_var(name: str, type_token: str, value: str) -> str:
@@ -155,9 +223,9 @@ def parse_var(name: str, type_token: str, value: str) -> str:
     Handles numbers, pointers, buffers, structs, and runtime function calls.
     Ensures globals are always stored with pointer types in LLVM.
     """
+    if is_local_scope() and parse_local(name, type_token, value, symbols.VAR): return ""
     llvm_type = _types_.vox_type_to_llvm(type_token)
     pre_val = ""
-    struct_names = list(ctx.context.structs.keys())
 
     # ===========================
     # Number types (int, bool, etc.)
@@ -168,7 +236,7 @@ def parse_var(name: str, type_token: str, value: str) -> str:
             value = _types_.handle_bool(value)
         # Evaluate constant expressions
         if not (isinstance(value, str) and "(" in value and value.strip().endswith(")")):
-            value = evals.evaluate_expression(value)
+            value = evals.evaluate_expression(value, type_token)
         # Simple constant global
         if "(" not in value:
             return f"@{name} = global {llvm_type} {value}\n"
@@ -176,7 +244,7 @@ def parse_var(name: str, type_token: str, value: str) -> str:
     # ===========================
     # Struct types
     # ===========================
-    elif type_token in struct_names:
+    elif ctx.context.symbols.struct(type_token) is not None:
         return parse_struct_var(name, type_token, value)
 
     # ===========================
@@ -204,8 +272,11 @@ def parse_var(name: str, type_token: str, value: str) -> str:
         # addr reference
         if value.startswith("addr "):
             ref_name = value.replace("addr ", "").strip()
-            if not ref_name in ctx.context.const_map: errors.err(f"Unknown reference '{ref_name}' for pointer variable '{name}'")
-            const_type = ctx.context.const_map[ref_name][1]
+            ref = ctx.context.symbols.const(ref_name)
+            if ref is None:
+                errors.err(f"Unknown reference '{ref_name}' for pointer variable '{name}'")
+                return ""
+            const_type = ref.type
             if const_type.startswith("buff"): return _types_.HandleGetElementPtr(name, base_type, value)
             return f"@{name} = global {llvm_type} @{ref_name}\n"
         # int -> pointer cast
@@ -216,7 +287,7 @@ def parse_var(name: str, type_token: str, value: str) -> str:
     # ===========================
     if "(" in value and value.strip().endswith(")"):
         # Pre-declare zero-initialized global
-        ctx.context.pre_entry += f"@{name} = global {llvm_type} zeroinitializer\n"
+        ctx.context.module.add_global(f"@{name} = global {llvm_type} zeroinitializer")
         tmp = f"%tmp_init{ctx.context.fn_call_num}"
         ctx.context.fn_call_num += 1
         # Generate call and store inside function
@@ -239,97 +310,84 @@ def parse_var(name: str, type_token: str, value: str) -> str:
 def parse_debug_print(toks):
     ret = ""
     for tok in toks[1:]:
-        if ctx.context.const_map.__contains__(tok):
-            ret += ctx.context.const_map[tok][0]
+        const = ctx.context.symbols.const(tok)
+        if const is not None:
+            ret += const.value
         elif tok == "ctime_print":
             pass
         else:
             ret += tok + " "
     return "[CTIME_PRINT]" + ret
 
-def parseDynImport(line: str) -> str:
+def parseDynImport(node: nodes.DynImport) -> str:
     """
-    Parse a dyn_import function line, register it as a Funtion object,
+    Register a dyn_import function as a Funtion object,
     and return LLVM declaration.
     """
     from compiler_modules.functions import Funtion
-    line = line.strip()
-    if not line.startswith("dyn_import fn "):
-        errors.err("Line must start with 'dyn_import fn '")
-        return ""
-    
-    line = line[len("dyn_import fn "):].strip()
-    
-    # Extract return type and rest
-    ret_type_end = line.find(" ")
-    if ret_type_end == -1:
-        errors.err("Invalid function declaration: missing function name")
-        return ""
-    
-    ret_type_vox = line[:ret_type_end].strip()
-    rest = line[ret_type_end:].strip()
-    
-    # Extract function name and parameters
-    name_start = rest.find("(")
-    name_end = rest.rfind(")")
-    if name_start == -1 or name_end == -1:
-        errors.err("Invalid function declaration: missing parameters")
-        return ""
-    
-    func_name = rest[:name_start].strip()
-    params_str = rest[name_start+1:name_end].strip()
-    
+    func_name = node.name
+
     # Parse parameters
     llvm_params = []
     args_dict = {}
-    if params_str:
-        for param in params_str.split(","):
-            param_name, param_type_vox = param.split(":")
-            param_name = param_name.strip()
-            param_type_vox = param_type_vox.strip()
-            llvm_type = _types_.vox_type_to_llvm(param_type_vox)
-            llvm_params.append(f"{llvm_type} %{param_name}")
-            args_dict[param_name] = llvm_type
-    
+    for param_name, param_type_vox in node.params:
+        llvm_type = _types_.vox_type_to_llvm(param_type_vox)
+        llvm_params.append(f"{llvm_type} %{param_name}")
+        args_dict[param_name] = llvm_type
+
     # Map return type
-    ret_type_llvm = _types_.vox_type_to_llvm(ret_type_vox)
-    
+    ret_type_llvm = _types_.vox_type_to_llvm(node.ret_type)
+
     # Register function: declare-only
-    func_obj = Funtion(name=func_name, args=args_dict, ret_type=ret_type_llvm, body="")
+    func_obj = Funtion(name=func_name, args=args_dict, ret_type=node.ret_type, body=[])
     ctx.context.functions[func_name] = [func_obj, True]  # True = declare-only
-    
-    # Build LLVM declaration
-    llvm_decl = f"declare {ret_type_llvm} @{func_name}({', '.join(llvm_params)})\n\n"
-    return llvm_decl
 
-def help1(llvm_args, arg_name, arg_type, arg_val, scope, tmp):
-    print(f"HELP1: arg_name={arg_name}, arg_type={arg_type}, arg_val={arg_val}, scope={scope}, tmp={tmp}")
-    fn = None
-    arg_list = []
-    
-    try: fn = ctx.context.functions[ctx.context.current_function][0]; arg_list = list(fn.args.keys())
-    except: pass
+    # Build LLVM declaration, emitted by functions.reference() once the function is called
+    llvm_decl = f"declare {ret_type_llvm} @{func_name}({', '.join(llvm_params)})"
+    func_obj.decl = llvm_decl
+    return llvm_decl
 
-    if arg_val in arg_list or arg_name in arg_list:
-        llvm_args.append(f"{arg_type} %{arg_val}")
+def string_literal(s: str) -> str:
+    """i8* constant expression for a string literal, identical literals share one pooled global."""
+    timing.count("string literals")
+    module = ctx.context.module
+    entry = module.strings.get(s)
+    if entry is None:
+        body = _types_.escape_string(s).replace('"', "\\20")
+        size = len(escape_re.sub("_", body)) + 1  # \0A and friends are one byte
+        entry = module.intern_string(s, f"[{size} x i8]", f'c"{body}\\00"')
+    gname, array_type = entry
+    return f"getelementptr inbounds ({array_type}, {array_type}* {gname}, i32 0, i32 0)"
+
+def const_immediate(name: str, llvm_type: str):
+    """LLVM literal of a compile time number const converted to llvm_type, None if it has to be loaded."""
+    type_token = evals.llvm_type_tokens.get(llvm_type)
+    if type_token is None: return None
+    try:
+        return evals.literal(evals.convert(evals.lookup(name), type_token), type_token)
+    except (evals.NotConstant, OverflowError, ValueError):  # e.g. an infinite float const as an int
+        return None
+
+def help1(llvm_args, arg_name, arg_type, arg_val):
+    if log.level >= log.TRACE: log.trace(f"HELP1: arg_name={arg_name}, arg_type={arg_type}, arg_val={arg_val}")
+    if ctx.context.symbols.is_const(arg_val):
+        # folded consts are immediates, runtime ones (e.g. stdout = GetStdHandle(...)) load once per block
+        value = const_immediate(arg_val, arg_type)
+        if value is None: value = _types_.load_as(arg_val, arg_type)
+        else: timing.count("const arguments folded")
+        llvm_args.append(f"{arg_type} {value}")
     else:
-        # local/global load
-        src = f"@{arg_val}"
-        if scope != "Vmain": 
-            fn.body += f"  {tmp} = load {arg_type}, {arg_type}* {src}\n"
-        else: ctx.context.Vmain += f"  {tmp} = load {arg_type}, {arg_type}* {src}\n"
-        llvm_args.append(f"{arg_type} {tmp}")
+        # locals, loop vars and globals are read with their own type, then converted to the param
+        llvm_args.append(f"{arg_type} {_types_.load_as(arg_val, arg_type)}")
 
 def parseFunctionCallS(line: str, retT="?") -> str:
     """
     Convert a Vox function call into LLVM IR. Ensures:
       • argument positions strictly follow the signature
-      • string literals become globals in pre_entry
+      • string literals become module globals
       • constants / args load correctly into the current function scope
       • no argument is ever skipped (no misalignment)
     """
-    from compiler_modules.functions import Funtion
-
     line = line.strip()
     if "(" not in line or not line.endswith(")"):
         errors.err("Not a valid function call line")
@@ -340,22 +398,6 @@ def parseFunctionCallS(line: str, retT="?") -> str:
     # -----------------------------
     func_name = line[:line.find("(")].strip()
     args_str = line[line.find("(") + 1:-1].strip()
-    syscall = False
-    if func_name.startswith("__syscall__"): syscall = True
-    if func_name not in ctx.context.functions and not syscall:
-        errors.err(f"Unknown function: {func_name}")
-        return ""
-
-    func_obj = None
-    declare_only = False
-    if syscall:
-        declare_only = True
-        func_obj = Funtion(func_name, args={"num":"i64","arg1":"i64","arg2":"i64","arg3":"i64","arg4":"i64","arg5":"i64","arg6":"i64"}, ret_type="i64", body="")
-    else:
-        func_obj: Funtion = ctx.context.functions[func_name][0]
-        declare_only = ctx.context.functions[func_name][1]
-
-    func_obj.MakeNonNone()
 
     # Safe argument splitter
     args = []
@@ -372,6 +414,30 @@ def parseFunctionCallS(line: str, retT="?") -> str:
     if cur.strip():
         args.append(cur.strip())
 
+    return lower_call(func_name, args, retT)
+
+def lower_call(func_name: str, args: list, retT="?") -> str:
+    """Lower a call to func_name with already split argument texts (see nodes.Call)."""
+    from compiler_modules.functions import Funtion
+
+    syscall = False
+    if func_name.startswith("__syscall__"): syscall = True
+    if func_name not in ctx.context.functions and not syscall:
+        errors.err(f"Unknown function: {func_name}")
+        return ""
+
+    func_obj = None
+    declare_only = False
+    if syscall:
+        declare_only = True
+        func_obj = Funtion(func_name, args={"num":"i64","arg1":"i64","arg2":"i64","arg3":"i64","arg4":"i64","arg5":"i64","arg6":"i64"}, ret_type="int64", body=[])
+    else:
+        func_obj: Funtion = ctx.context.functions[func_name][0]
+        declare_only = ctx.context.functions[func_name][1]
+        functions.reference(func_name)
+
+    func_obj.MakeNonNone()
+
     # -----------------------------
     # Strict argument count check
     # -----------------------------
@@ -394,9 +460,8 @@ def parseFunctionCallS(line: str, retT="?") -> str:
         arg_val = args[i]
         arg_type = "+"   # defualt
         if arg_type_vox is None: continue
-        if not ctx.context.current_function is None: 
-            fn: Funtion = ctx.context.functions[ctx.context.current_function][0]
-            if fn.is_arg(arg_val): arg_type = _types_.vox_type_to_llvm(fn.get_arg_Type(arg_val))
+        arg_sym = ctx.context.symbols.arg(arg_val)
+        if arg_sym is not None: arg_type = _types_.vox_type_to_llvm(arg_sym.type)
 
         # Convert Vox → LLVM type
         try:
@@ -414,13 +479,7 @@ def parseFunctionCallS(line: str, retT="?") -> str:
         # 1. String literal: addr "hello world"
         # ------------------------------------------------------------
         if arg_val.startswith('addr "') and arg_val.endswith('"'):
-            s: str = arg_val[6:-1]
-
-            gname = f"@.str{len(ctx.context.pre_entry)+1}"
-            ctx.context.pre_entry += f'{gname} = private constant [{len(s)+1} x i8] c{_types_.process_string(s, len(s)+1)}\n\n'
-            
-
-            llvm_args.append( f"i8* getelementptr([{len(s)} x i8], [{len(s)+1} x i8]* {gname}, i32 0, i32 0)" )
+            llvm_args.append(f"i8* {string_literal(arg_val[6:-1])}")
             continue
 
         # ------------------------------------------------------------
@@ -433,7 +492,7 @@ def parseFunctionCallS(line: str, retT="?") -> str:
             if not arg_type.endswith("*"): llvm_type_ptr = f"{arg_type}*"
             else: llvm_type_ptr = arg_type
 
-            llvm_args.append(f"{llvm_type_ptr} @{name}")
+            llvm_args.append(f"{llvm_type_ptr} {ctx.context.symbols.address(name)}")
             continue
 
 
@@ -446,24 +505,17 @@ def parseFunctionCallS(line: str, retT="?") -> str:
             continue
 
         # ------------------------------------------------------------
-        # 4. Load constant / local variable from const_map or locals
+        # 4. Load constant / local variable through the symbol table
         # ------------------------------------------------------------
-        if arg_val in ctx.context.const_map:
-            scope = ctx.context.current_function or "Vmain"
-            tmp = compy.tmp_var()
-
-            # Is the target a function argument?
-            help1(llvm_args, arg_name, arg_type, arg_val, scope, tmp)
+        if ctx.context.symbols.is_const(arg_val) or ctx.context.symbols.is_var(arg_val):
+            help1(llvm_args, arg_name, arg_type, arg_val)
             continue
 
         # ------------------------------------------------------------
         # 5. If current function argument
         # ------------------------------------------------------------
-        if (
-            ctx.context.current_function and
-            ctx.context.functions[ctx.context.current_function][0].is_arg(arg_val)
-        ):
-            llvm_args.append(f"{arg_type} %{arg_val}")
+        if arg_sym is not None:
+            llvm_args.append(f"{arg_type} {_types_.load_as(arg_val, arg_type)}")
             continue
 
         # ------------------------------------------------------------
@@ -482,305 +534,140 @@ def parseFunctionCallS(line: str, retT="?") -> str:
     return f"  call {real_ret} @{func_name}({', '.join(llvm_args)})\n"
 
   
-def chars(s: str) -> list:
-    return [c for c in s]
-
-def joinchars(l: list) -> str:
-    return "".join(l)
-
 Pscope = ""
 
-# Globals expected to exist:
-# Pscope
-# utils.AddToScope(code: str, scope: str)
-# _types_.handle_bool(cond_str) -> str
-
-# Internal bookkeeping for open if contexts
-last_ifnum = 0
-
-def _ensure_trailing_newline(s: str) -> str:
-    return s if s.endswith("\n") else s + "\n"
-
-def parse_line(line: str, scope: str = "Vmain"):
-    global Pscope
-    if scope != Pscope: print(f"============================= SCOPE CNAHGE +++++++++++++++++\n{Pscope} -> {scope}\n")
-    Pscope = scope
-
-    # remove the first space
-    if line.startswith(" "): line = joinchars(chars(line)[1:])
-    if ctx.context.asm_mode:
-        # # call void asm sideeffect inteldialect "mov eax, 1", ""
-        if line.__contains__("#"):
-            pass
-        else:
-            utils.AddToScope(f"    call void asm sideeffect {ctx.context.asm_dialect} \"{line.strip()}\", \"\"\n", scope)
-
-    elif line.strip().startswith("ASM:"):
-        ctx.context.asm_mode = True
-
-    elif line.strip().startswith("asmend:"):
-        ctx.context.asm_mode = False
-
-    elif line.strip().startswith("return"):
-        scope = ctx.context.current_function
-
-        # Extract text after "return"
-        parts = line.strip().split(None, 1)
+# ---- per node lowering, dispatched by parse_node ----
 
-        # Look up current function return type
-        func, _ = ctx.context.functions[ctx.context.current_function]
-        ret_type = func.ret_type.strip()
+def parse_const_node(node: nodes.Const, scope: str):
+    ctx.context.module.add_global(parse_const(node.name, node.type, node.value.strip()))
 
-        # Case 1: bare "return"
-        if len(parts) == 1:
-            # Expect void return
-            if ret_type == "void": utils.AddToScope("  ret void\n", scope)
-            else: errors.err(f"Function {scope} must return {ret_type}, but got empty return")
-            return
+def parse_var_node(node: nodes.Var, scope: str):
+    ctx.context.symbols.define(node.name, symbols.VAR, node.type)
+    ctx.context.module.add_global(parse_var(node.name, node.type, node.value.strip()))
 
-        # Case 2: "return VALUE"
-        value = parts[1].strip()
+def parse_fn_node(node: nodes.Fn, scope: str):
+    if not ctx.context.current_function is None:
+        errors.err(f"Function '{node.name}' must be defined at the top level")
+        return
+    compy.Handle_FN(node)
 
-        # If the return type is void but user returned something
-        if ret_type == "void": errors.err(f"Function {scope} returns void but got: return {value}")
+def parse_struct_node(node: nodes.Struct, scope: str):
+    compy.Handle_STRUCT(node)
 
-        # Emit typed return
-        utils.AddToScope(f"  ret {ret_type} {value}\n", scope)
+def parse_if_node(node: nodes.If, scope: str):
+    compy.Handle_IF(node, scope)
 
+def parse_while_node(node: nodes.While, scope: str):
+    compy.Handle_WHILE(node, scope)
 
+def parse_for_node(node: nodes.For, scope: str):
+    compy.Handle_FOR(node, scope)
 
-    # === ctx.context.functions ===
-    elif re.match(r'^\s*(\w+)\s*\((.*)\)\s*$', line.strip()):
+def parse_call_node(node: nodes.Call, scope: str):
+    utils.AddToScope(lower_call(node.name, node.args), scope)
 
-        utils.AddToScope(parseFunctionCallS(line), scope)
+def parse_using_node(node: nodes.Using, scope: str):
+    # using NAME = TYPE
+    ctx.context.symbols.define(node.name, symbols.ALIAS, node.type)
 
-    elif line.strip().startswith("using "):
-        # using NAME = TYPE
-        toks = line.split(" ")
-        ctx.context.aliases[toks[1]] = toks[3]
-
-    # === DEBUG ===
-    elif line.strip().startswith("ctime_print"):
-        toks = line.replace("\"", "").strip().split(" ")
-        toprint = parse_debug_print(toks)
-        print(toprint)
-
-    # ==== IMPORTS ====
-    elif line.strip().startswith("lib"):
-        # lib dyn|static <LIB_NAME>|"LIB_NAME"
-        toks = line.split(" ")
-        if toks[1] == "dyn":
-            _libs_.HandleDynLib(toks[2], scope)
-        elif toks[1] == "static":
-            _libs_.HandleStaticLib(toks[2], scope)
-        else:
-            errors.err(f"Unknown lib type '{toks[1]}'")
-
-    elif line.strip().startswith("dyn_import fn ") and line.endswith("."):
-        ctx.context.pre_entry += parseDynImport(line)
-
-    elif line.strip().startswith("dyn_import fn "):
-        ctx.context.in_dyn_fn_import = True
-        ctx.context.current_dyn_fn_import = line.strip().replace("  ", "")
-
-    elif ctx.context.in_dyn_fn_import:
-        ctx.context.current_dyn_fn_import += line.strip().replace("  ", "")
-        if line.endswith("."):
-            ctx.context.pre_entry += parseDynImport(ctx.context.current_dyn_fn_import)
-            ctx.context.in_dyn_fn_import = False
-            ctx.context.current_dyn_fn_import = ""
-            
-    elif line.strip().startswith("dyn_import "):
-        ctx.context.pre_entry += parseDynImport(line)
-
-
-    # ==== LABELS AND GOTOs ====
-    
-    elif line.startswith("lb "):
-        label_name = line.strip()[3:].strip()
-        utils.AddToScope(f"  br label %{label_name}\n{label_name}:\n", scope)
-        
-    elif line.strip().startswith("goto "):
-        label_name = line.strip()[5:].strip()
-        utils.AddToScope(f"  br label %{label_name}\n", scope)
-
-    # ==== CONST AND VAR DECLARATIONS ====
-    elif line.strip().startswith("const "):
-        # const NAME: TYPE = VALUE
-        line_fixed = re.sub(r'(\b\w+):', r'\1 :', line)
-        toks = line_fixed.strip().split(" ")
-        # format: var NAME : TYPE = VALUE
-        name = toks[1].split(":")[0]
-        colon = toks[2]
-        value = utils.GetAssignValue(toks)
-        match = re.search(r':\s*(.*?)\s*=', line)
-        type_token = ""
-        if match: type_token = match.group(1)
-        res = parse_const(name, type_token, value.strip())
-        ctx.context.pre_entry += res
-
-    elif line.strip().startswith("var "):
-        toks = line.strip().replace(":", " : ").replace(" :  ", " : ").split(" ")
-        # format: var NAME : TYPE = VALUE
-        name = toks[1].split(":")[0]
-        colon = toks[2]
-        value = utils.GetAssignValue(toks)
-        type_token = line.replace(colon, "").replace(f"var {name}", "").replace(" = ", "").replace(value, "").strip()
-        ctx.context.var_map[name] = type_token
-        ctx.context.pre_entry += parse_var(name, type_token, value.strip())
-
-    # ==== MEMORY ====
-    elif line.startswith("*"):
-        # *(MEM_ADDR): TYPE = VALUE
-        # ->
-        # %ptrX = inttoptr i64 MEM_ADDR to i32*
-        # store TYPE VALUE, TYPE* MEM_ADDR
-        line = line.replace("*", "").replace("(", "").replace(")", "").replace(" = ", " ").replace(":", "").strip()
-        # line: [MEM_ADDR, TYPE, VALUE]
-        toks = line.split(" ")
-        mem.HandleMem_Write(toks, scope)
+def parse_ctime_print_node(node: nodes.CtimePrint, scope: str):
+    toks = f"ctime_print {node.args}".replace("\"", "").strip().split(" ")
+    print(parse_debug_print(toks))
 
+def parse_lib_node(node: nodes.Lib, scope: str):
+    # lib dyn|static <LIB_NAME>|"LIB_NAME"
+    if node.kind == "dyn":
+        _libs_.HandleDynLib(node.target, scope)
+    elif node.kind == "static":
+        _libs_.HandleStaticLib(node.target, scope)
     else:
-        errors.err(f"Unrecognized line: {line}")
-
-def parse_line_tool(line: str, scope: str = "Vmain"):
+        errors.err(f"Unknown lib type '{node.kind}'")
+
+def parse_dyn_import_node(node: nodes.DynImport, scope: str):
+    ctx.context.dyn_imports.append((node.name, node.line))
+    parseDynImport(node)
+
+def parse_asm_node(node: nodes.Asm, scope: str):
+    # call void asm sideeffect inteldialect "mov eax, 1", ""
+    for line in node.lines:
+        # functions named from assembly are used too, declarations are only emitted for used ones
+        for word in asm_word_re.findall(line):
+            if word in ctx.context.functions: functions.reference(word)
+        utils.AddToScope(f"    call void asm sideeffect {ctx.context.asm_dialect} \"{line}\", \"\"\n", scope)
+
+def parse_return_node(node: nodes.Return, scope: str):
+    scope = ctx.context.current_function
+    if scope is None:
+        errors.err("'return' outside of a function")
+        return
+
+    # Look up current function return type
+    func, _ = ctx.context.functions[scope]
+    ret_type = func.ret_type.strip()
+
+    # Case 1: bare "return"
+    if node.value is None:
+        # Expect void return
+        if ret_type == "void": utils.AddToScope("  ret void\n", scope)
+        else: errors.err(f"Function {scope} must return {ret_type}, but got empty return")
+        return
+
+    # Case 2: "return VALUE"
+    # If the return type is void but user returned something
+    if ret_type == "void": errors.err(f"Function {scope} returns void but got: return {node.value}")
+
+    # Emit typed return, names are loaded from their slot or global first
+    value = node.value.strip()
+    table = ctx.context.symbols
+    if table.is_arg(value) or table.is_var(value) or table.is_const(value): value = _types_.load_as(value, ret_type)
+    utils.AddToScope(f"  ret {ret_type} {value}\n", scope)
+
+def parse_label_node(node: nodes.Label, scope: str):
+    utils.AddToScope(f"  br label %{node.name}\n{node.name}:\n", scope)
+
+def parse_goto_node(node: nodes.Goto, scope: str):
+    utils.AddToScope(f"  br label %{node.name}\n", scope)
+
+def parse_mem_write_node(node: nodes.MemWrite, scope: str):
+    # *(MEM_ADDR): TYPE = VALUE
+    # ->
+    # store TYPE VALUE, TYPE* MEM_ADDR
+    mem.HandleMem_Write([node.addr, node.type, node.value], scope)
+
+def parse_safety_node(node: nodes.Safety, scope: str):
+    ctx.context.unsafe_mode = node.unsafe
+
+node_handlers = {
+    nodes.Const: parse_const_node,
+    nodes.Var: parse_var_node,
+    nodes.Fn: parse_fn_node,
+    nodes.Struct: parse_struct_node,
+    nodes.If: parse_if_node,
+    nodes.While: parse_while_node,
+    nodes.For: parse_for_node,
+    nodes.Call: parse_call_node,
+    nodes.Using: parse_using_node,
+    nodes.CtimePrint: parse_ctime_print_node,
+    nodes.Lib: parse_lib_node,
+    nodes.DynImport: parse_dyn_import_node,
+    nodes.Asm: parse_asm_node,
+    nodes.Return: parse_return_node,
+    nodes.Label: parse_label_node,
+    nodes.Goto: parse_goto_node,
+    nodes.MemWrite: parse_mem_write_node,
+    nodes.Safety: parse_safety_node,
+}
+
+def parse_node(node: nodes.Node, scope: str = "Vmain"):
+    """Lower a single AST node into the IR of scope."""
     global Pscope
-    if scope != Pscope: print(f"============================= SCOPE CNAHGE +++++++++++++++++\n{Pscope} -> {scope}\n")
+    if scope != Pscope and log.level >= log.TRACE: log.trace(f"scope change: {Pscope} -> {scope}")
     Pscope = scope
 
-    # remove the first space
-    if line.startswith(" "): line = joinchars(chars(line)[1:])
-    if ctx.context.asm_mode:
-        # # call void asm sideeffect inteldialect "mov eax, 1", ""
-        if line.__contains__("#"):
-            pass
-        else:
-            return f"    call void asm sideeffect {ctx.context.asm_dialect} \"{line.strip()}\", \"\"\n"
-
-    elif line.strip().startswith("ASM:"):
-        ctx.context.asm_mode = True
-
-    elif line.strip().startswith("asmend:"):
-        ctx.context.asm_mode = False
-
-    elif line.strip().startswith("return"):
-        scope = ctx.context.current_function
-
-        # Extract text after "return"
-        parts = line.strip().split(None, 1)
-
-        # Look up current function return type
-        func, _ = ctx.context.functions[ctx.context.current_function]
-        ret_type = func.ret_type.strip()
-
-        # Case 1: bare "return"
-        if len(parts) == 1:
-            # Expect void return
-            if ret_type == "void": return "  ret void\n", scope
-            else: errors.err(f"Function {scope} must return {ret_type}, but got empty return")
-            return "\n; error here with return"
+    ctx.context.lineN = node.line
+    ctx.context.line_content = node.text
+    node_handlers[type(node)](node, scope)
 
-        # Case 2: "return VALUE"
-        value = parts[1].strip()
-
-        # If the return type is void but user returned something
-        if ret_type == "void": errors.err(f"Function {scope} returns void but got: return {value}")
-
-        # Emit typed return
-        return f"  ret {ret_type} {value}\n"
-
-
-
-    # === ctx.context.functions ===
-    elif re.match(r'^\s*(\w+)\s*\((.*)\)\s*$', line.strip()):
-
-        return parseFunctionCallS(line)
-
-    elif line.strip().startswith("using "):
-        # using NAME = TYPE
-        toks = line.split(" ")
-        ctx.context.aliases[toks[1]] = toks[3]
-
-    # === DEBUG ===
-    elif line.strip().startswith("ctime_print"):
-        toks = line.replace("\"", "").strip().split(" ")
-        toprint = parse_debug_print(toks)
-        print(toprint)
-
-    # ==== IMPORTS ====
-    elif line.strip().startswith("lib"):
-        # lib dyn|static <LIB_NAME>|"LIB_NAME"
-        toks = line.split(" ")
-        if toks[1] == "dyn":
-            _libs_.HandleDynLib(toks[2], scope)
-        elif toks[1] == "static":
-            _libs_.HandleStaticLib(toks[2], scope)
-        else:
-            errors.err(f"Unknown lib type '{toks[1]}'")
-
-    elif line.strip().startswith("dyn_import fn ") and line.endswith("."):
-        ctx.context.pre_entry += parseDynImport(line)
-
-    elif line.strip().startswith("dyn_import fn "):
-        ctx.context.in_dyn_fn_import = True
-        ctx.context.current_dyn_fn_import = line.strip().replace("  ", "")
-
-    elif ctx.context.in_dyn_fn_import:
-        ctx.context.current_dyn_fn_import += line.strip().replace("  ", "")
-        if line.endswith("."):
-            ctx.context.pre_entry += parseDynImport(ctx.context.current_dyn_fn_import)
-            ctx.context.in_dyn_fn_import = False
-            ctx.context.current_dyn_fn_import = ""
-            
-    elif line.strip().startswith("dyn_import "):
-        ctx.context.pre_entry += parseDynImport(line)
-
-
-    # ==== LABELS AND GOTOs ====
-    
-    elif line.startswith("lb "):
-        label_name = line.strip()[3:].strip()
-        return f"  br label %{label_name}\n{label_name}:\n"
-        
-    elif line.strip().startswith("goto "):
-        label_name = line.strip()[5:].strip()
-        return f"  br label %{label_name}\n"
-
-    # ==== CONST AND VAR DECLARATIONS ====
-    elif line.strip().startswith("const "):
-        # const NAME: TYPE = VALUE
-        line_fixed = re.sub(r'(\b\w+):', r'\1 :', line)
-        toks = line_fixed.strip().split(" ")
-        # format: var NAME : TYPE = VALUE
-        name = toks[1].split(":")[0]
-        colon = toks[2]
-        value = utils.GetAssignValue(toks)
-        match = re.search(r':\s*(.*?)\s*=', line)
-        type_token = ""
-        if match: type_token = match.group(1)
-        res = parse_const(name, type_token, value.strip())
-        ctx.context.pre_entry += res
-
-    elif line.strip().startswith("var "):
-        toks = line.strip().replace(":", " : ").replace(" :  ", " : ").split(" ")
-        # format: var NAME : TYPE = VALUE
-        name = toks[1].split(":")[0]
-        colon = toks[2]
-        value = utils.GetAssignValue(toks)
-        type_token = line.replace(colon, "").replace(f"var {name}", "").replace(" = ", "").replace(value, "").strip()
-        ctx.context.var_map[name] = type_token
-        ctx.context.pre_entry += parse_var(name, type_token, value.strip())
-
-    # ==== MEMORY ====
-    elif line.startswith("*"):
-        # *(MEM_ADDR): TYPE = VALUE
-        # ->
-        # %ptrX = inttoptr i64 MEM_ADDR to i32*
-        # store TYPE VALUE, TYPE* MEM_ADDR
-        line = line.replace("*", "").replace("(", "").replace(")", "").replace(" = ", " ").replace(":", "").strip()
-        # line: [MEM_ADDR, TYPE, VALUE]
-        toks = line.split(" ")
-        mem.HandleMem_Write(toks, scope)
-
-    else:
-        errors.err(f"Unrecognized line: {line}")
+def parse_body(body: list, scope: str = "Vmain"):
+    for node in body:
+        parse_node(node, scope)
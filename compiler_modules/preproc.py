@@ -4,7 +4,10 @@ import sys
 import platform
 import re
 import compiler_modules.errors as errors
-import json
+import compiler_modules.cache as cache
+import compiler_modules.timing as timing
+import compiler_modules.log as log
+import compiler_modules.resolver as resolver
 
 # -------------------------
 # Operating System
@@ -56,151 +59,153 @@ py_major = sys.version_info.major
 py_minor = sys.version_info.minor
 ctx.context.ifdef_defs.append(f"PYTHON_{py_major}_{py_minor}")
 
-print(ctx.context.ifdef_defs)
+log.trace(f"ifdefs: {ctx.context.ifdef_defs}")
+
+comment_re = re.compile(r'#.*')
+import_re_global = re.compile(r'import\s+<([\w\d_.-]+)>')
+import_re_local = re.compile(r'import\s+"([\w\d_.-]+)"')
+directives = {"d_if", "d_elif", "d_else", "d_endif"}
+
+# Streaming preprocessor.
+# Each file is read once and walked line by line: directives drive a condition stack, imports are
+# expanded in place by a nested generator, and every surviving line is yielded with the file and
+# line it came from. PreProcess() joins the result once, so the work is linear in the total output.
+# A resolved path is only ever included once per translation unit, which also breaks import cycles.
 
 def remove_comments(line: str) -> str:
     """Remove comments from a line."""
-    comment_re = re.compile(r'#.*')
     return comment_re.sub('', line)
 
-def read_file(path: str) -> str:
-    """Read a file and return its content."""
+def read_file(path: str):
+    """Read a file and return its content or None, recording the probe for the compilation cache."""
+    abs_path = os.path.abspath(path)
     try:
         with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        print(f"File '{path}' not found.")
-        return ""
+            content = f.read()
+    except (FileNotFoundError, IsADirectoryError):
+        ctx.context.import_probes[abs_path] = None
+        if log.level >= log.TRACE: log.trace(f"File '{path}' not found.")
+        return None
+    ctx.context.import_probes[abs_path] = cache.sha256_file(abs_path)
+    return content
 
-def process_global_import(module_name: str) -> str:
-    """Process a global import by reading from vox_path.json paths with ifdefs."""
-    try:
-        with open("vox_path.json", "r", encoding="utf-8") as pf:
-            paths_file = json.load(pf)
-    except FileNotFoundError:
-        errors.err("vox_path.json not found.")
-        return ""
-    
-    code = ""
-    for_us = paths_file[os_name]
-    for path in for_us:
-        full_path = os.path.join(path, module_name)
-        module_code = read_file(full_path)
-        if module_code:
-            code += module_code + "\n"
-        
-    if code == "": errors.err(f"Module '{module_name}' not found in vox_path.json paths because OS is {os_name}: {for_us}")
-    return code
-
-
-def process_local_import(module_name: str) -> str:
-    """Process a local import by reading the file directly."""
-    code = read_file(module_name)
-    return PreProcess(code) + "\n" if code else ""
-
-def HLocalPre(lines_no_comments, lpc, m_local, m_global):
-    final = ""
-    in_ifdef = False
-    if lines_no_comments[lpc - 1].startswith("d_if"):
-        in_ifdef = True
-    elif lines_no_comments[lpc - 1].startswith("d_endif"):
-        in_ifdef = False
-    if in_ifdef:
-        # resolve ifdef
-        while lpc < len(lines_no_comments) and not lines_no_comments[lpc].startswith("d_endif"):
-            ifdef_line = lines_no_comments[lpc]
-        condition = ifdef_line.replace(":", "").split(" ")[1]
-        if handle_ifdef(condition):
-            final += process_local_import(m_global.group(1))
-            lpc += 1
-    else:
-        final += process_local_import(m_local.group(1))
-        lpc += 1
+def handle_ifdef(condition: str) -> bool:
+    return condition in ctx.context.ifdef_defs
 
-    return final
+def get_ifdef_condition(stripped: str) -> str:
+    # 'd_if LINUX:' -> 'LINUX'
+    return "".join(stripped.replace(":", "").split(" ")[1:])
 
-def HGlobalPre(lines_no_comments, lpc, m_global):
-    final = ""
-    in_ifdef = False
-    if lines_no_comments[lpc - 1].startswith("d_if"):
-        in_ifdef = True
-    elif lines_no_comments[lpc - 1].startswith("d_endif"):
-        in_ifdef = False
-    if in_ifdef:
-        # resolve ifdef
-        while lpc < len(lines_no_comments) and not lines_no_comments[lpc].startswith("d_endif"):
-            ifdef_line = lines_no_comments[lpc]
-        condition = ifdef_line.replace(":", "").split(" ")[1]
-        if handle_ifdef(condition):
-            final += process_global_import(m_global.group(1))
-            lpc += 1
-    else:
-        final += process_global_import(m_global.group(1))
-        lpc += 1
+class CondFrame:
+    """One open d_if: whether the enclosing region is live, whether a branch was taken, whether this one is live."""
+    __slots__ = ("parent", "taken", "active", "seen_else", "origin")
 
-    return final
+    def __init__(self, parent: bool, cond: bool, origin: tuple):
+        self.parent = parent
+        self.taken = cond
+        self.active = parent and cond
+        self.seen_else = False
+        self.origin = origin
 
-def get_ifdef_condition(tokens: list) -> str:
-    ret = ""
-    i = 0
-    while i < len(tokens):
-        tok = tokens[i]
-        if i == 0:
-            i += 1
-        else:
-            ret += tok
-            i += 1
-
-    return ret
-
-def PreProcess(code: str) -> str:
-    final = ""
-    
-    # Remove comments first
-    lines_no_comments = [remove_comments(line) for line in code.splitlines()]
-    in_ifdef = False
-    # Compile regexes once
-    import_re_global = re.compile(r'import\s+<([\w\d_.-]+)>')
-    import_re_local = re.compile(r'import\s+"([\w\d_.-]+)"')
-    lpc = 0
-    while lpc < len(lines_no_comments):
-        line = lines_no_comments[lpc]
-        stripped = line.strip()
-        m_global = import_re_global.match(stripped)
-        m_local = import_re_local.match(stripped)
+class Preprocessor:
+    def __init__(self):
+        self.included = set()  # abs paths already expanded into this translation unit
+        self.graph = {}        # importer: {import as written: abs path | None}
 
+    def resolve(self, m_global, m_local, importer: str, where: tuple):
+        """Abs path an import line refers to, None (after reporting it) when it cannot be found."""
         if m_global:
-            final += HGlobalPre(lines_no_comments, lpc, m_global)
-            lpc += 1
-        elif m_local:
-            final += HLocalPre(lines_no_comments, lpc, m_local, m_global)
-            lpc += 1
-        elif stripped.startswith("d_if") or stripped.startswith("d_elif"):
-            in_ifdef = True
-            condition = get_ifdef_condition(stripped.replace(":", "").split(" "))
-            lpc += 1
-        elif stripped.startswith("d_endif"):
-            in_ifdef = False
-            lpc += 1
-
-        elif stripped.startswith("d_else") and not handle_ifdef(condition):
-            final += lines_no_comments[lpc] + "\n"
-            lpc += 1
-            
-
-        if in_ifdef and handle_ifdef(condition):
-            final += lines_no_comments[lpc] + "\n"
-            lpc += 1
-
-        elif not in_ifdef and lpc < len(lines_no_comments):
-            final += lines_no_comments[lpc] + "\n"
-            lpc += 1
-
+            module_name = m_global.group(1)
+            spelled = f"<{module_name}>"
+            res = resolver.resolve_global(module_name, os_name)
+            if res is None:
+                errors.err("vox_path.json not found.", where=where)
+                return None
         else:
-            lpc += 1
-        
-    print("Preprocessed code:\n", final)
+            module_name = m_local.group(1)
+            spelled = f'"{module_name}"'
+            res = resolver.resolve_local(module_name, importer)
+        # files that would shadow the module if they appeared, so the compilation cache watches them
+        for path in res.tried: ctx.context.import_probes[path] = None
+        self.graph.setdefault(os.path.abspath(importer) if importer else "<input>", {})[spelled] = res.path
+        if res.path is None:
+            if m_global: errors.err(f"Module '{module_name}' not found in vox_path.json paths because OS is {os_name}: {resolver.search_paths(os_name)}", where=where)
+            else: errors.err(f"Module '{module_name}' not found", where=where)
+        return res.path
+
+    def include(self, path):
+        """Lines of an imported file, nothing if it was already included or is compiled separately."""
+        if path is None or path in self.included: return
+        self.included.add(path)
+        code = read_file(path)
+        if code is None: return
+        timing.count("imports resolved")
+        if ctx.context.separate_modules:
+            # compiled as its own unit, only remember the dependency
+            ctx.context.module_imports.append(path)
+            return
+        yield from self.lines(code, path)
+
+    def lines(self, code: str, origin: str):
+        """Yield (text, file, line) for every line of code that survives preprocessing."""
+        if origin: self.included.add(os.path.abspath(origin))
+        conds = []
+        active = True
+        lineN = 0
+        for lineN, raw in enumerate(code.splitlines(), start=1):
+            line = remove_comments(raw)
+            stripped = line.strip()
+            where = (origin, lineN, raw)
+
+            keyword = stripped.split(" ", 1)[0].rstrip(":") if stripped.startswith("d_") else ""
+            if keyword in directives:
+                if keyword == "d_if":
+                    conds.append(CondFrame(active, handle_ifdef(get_ifdef_condition(stripped)), where))
+                elif keyword in ("d_elif", "d_else", "d_endif") and not conds:
+                    errors.err(f"'{keyword}' without a matching 'd_if'", where=where)
+                elif keyword == "d_elif":
+                    frame = conds[-1]
+                    if frame.seen_else: errors.err("'d_elif' after 'd_else'", where=where)
+                    cond = not frame.taken and handle_ifdef(get_ifdef_condition(stripped))
+                    frame.active = frame.parent and cond
+                    frame.taken = frame.taken or cond
+                elif keyword == "d_else":
+                    frame = conds[-1]
+                    if frame.seen_else: errors.err("duplicate 'd_else'", where=where)
+                    frame.seen_else = True
+                    frame.active = frame.parent and not frame.taken
+                    frame.taken = True
+                else:
+                    conds.pop()
+                active = conds[-1].active if conds else True
+                continue
+
+            if not active: continue
+
+            m_global = import_re_global.match(stripped)
+            m_local = None if m_global else import_re_local.match(stripped)
+            if m_global or m_local:
+                yield from self.include(self.resolve(m_global, m_local, origin, where))
+                continue
+
+            yield line, origin, lineN
+
+        timing.count("source lines", lineN)
+        for frame in conds:
+            errors.err("'d_if' without a matching 'd_endif'", where=frame.origin)
+
+def PreProcess(code: str, path: str = "") -> str:
+    """Preprocessed text of code, read from path, with ctx.context.line_origins mapping its lines back."""
+    texts = []
+    origins = []
+    pre = Preprocessor()
+    for text, file, lineN in pre.lines(code, path):
+        texts.append(text)
+        origins.append((file, lineN))
+    ctx.context.line_origins = origins
+    ctx.context.source_path = path
+    ctx.context.import_graph = pre.graph
+    final = "\n".join(texts) + "\n" if texts else ""
+
+    if log.level >= log.TRACE: log.trace(f"Preprocessed code:\n{final}")
     return final
- 
-def handle_ifdef(condition: str) -> bool:
-    return condition in ctx.context.ifdef_defs
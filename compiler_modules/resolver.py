@@ -0,0 +1,95 @@
+import json
+import os
+
+# Module resolution for import <...> and import "...".
+# vox_path.json is read once per process and every search directory is listed once, so resolving
+# an import is a few set lookups however many imports a build has. Results are memoized per
+# (directories, module name) and the first directory holding the module always wins.
+
+search_file = "vox_path.json"
+
+_search_paths = {}  # (abs vox_path.json, os name): [abs dirs], None when the file is missing
+_listings = {}      # abs dir: frozenset of entry names
+_resolved = {}      # (dirs, module name): Resolution
+graph = {}          # importer: {import as written: abs path | None}, every unit compiled by this process
+
+class Resolution:
+    __slots__ = ("path", "tried")
+
+    def __init__(self, path, tried: tuple):
+        self.path = path    # abs path of the module, None when no directory has it
+        self.tried = tried  # abs paths looked at before path, a file appearing there would change the result
+
+def clear():
+    """Forget everything, for long running processes that see files change."""
+    _search_paths.clear()
+    _listings.clear()
+    _resolved.clear()
+    graph.clear()
+
+def search_paths(os_name: str):
+    """Directories vox_path.json lists for os_name, None if there is no vox_path.json."""
+    key = (os.path.abspath(search_file), os_name)
+    if key not in _search_paths:
+        try:
+            with open(search_file, "r", encoding="utf-8") as pf:
+                paths = json.load(pf)
+        except FileNotFoundError:
+            _search_paths[key] = None
+        else:
+            entries = paths.get(os_name, []) if isinstance(paths, dict) else paths  # Voxy.py -a writes a plain list
+            _search_paths[key] = [os.path.abspath(p) for p in entries]
+    return _search_paths[key]
+
+def listing(directory: str) -> frozenset:
+    names = _listings.get(directory)
+    if names is None:
+        try:
+            names = frozenset(os.listdir(directory))
+        except OSError:
+            names = frozenset()
+        _listings[directory] = names
+    return names
+
+def find(dirs: tuple, module_name: str) -> Resolution:
+    """First of dirs holding module_name, memoized."""
+    key = (dirs, module_name)
+    res = _resolved.get(key)
+    if res is not None: return res
+    tried = []
+    path = None
+    nested = os.sep in module_name or (os.altsep is not None and os.altsep in module_name)
+    for directory in dirs:
+        candidate = os.path.join(directory, module_name)
+        present = os.path.isfile(candidate) if nested else module_name in listing(directory) and os.path.isfile(candidate)
+        if present:
+            path = candidate
+            break
+        tried.append(candidate)
+    res = _resolved[key] = Resolution(path, tuple(tried))
+    return res
+
+def resolve_global(module_name: str, os_name: str):
+    """Resolution of import <module_name>, None when there is no vox_path.json to search."""
+    dirs = search_paths(os_name)
+    if dirs is None: return None
+    return find(tuple(dirs), module_name)
+
+def resolve_local(module_name: str, importer: str) -> Resolution:
+    """Resolution of import "module_name": next to the importing file first, then the working directory."""
+    dirs = [os.getcwd()]
+    if importer: dirs.insert(0, os.path.dirname(os.path.abspath(importer)))
+    return find(tuple(dict.fromkeys(dirs)), module_name)
+
+def record(unit_graph: dict):
+    """Merge the imports of one translation unit into graph."""
+    for importer, edges in unit_graph.items():
+        graph.setdefault(importer, {}).update(edges)
+
+def format_graph() -> str:
+    lines = []
+    for importer, edges in graph.items():
+        lines.append(importer)
+        for spelled, path in edges.items():
+            lines.append(f"  {spelled} -> {path if path is not None else '(not found)'}")
+    return "\n".join(lines)
@@ -0,0 +1,125 @@
+# Scoped symbol table.
+# Scopes nest global -> function -> block (if/elif/else bodies). Every name maps to a stack of the
+# symbols that currently bind it, innermost last, so lookups are a single dict access whatever the
+# nesting depth and leaving a scope only touches the names it defined.
+# Values (consts, vars, args) and types (structs, aliases) live in separate namespaces, function locals
+# and loop vars are vars whose addr is their alloca slot.
+
+CONST = "const"
+VAR = "var"
+ARG = "arg"
+STRUCT = "struct"
+ALIAS = "alias"
+
+type_kinds = (STRUCT, ALIAS)
+
+GLOBAL = "global"
+FUNCTION = "function"
+BLOCK = "block"
+
+class Symbol:
+    __slots__ = ("name", "kind", "type", "value", "folded", "addr")
+
+    def __init__(self, name: str, kind: str, type_: str, value=None):
+        self.name = name
+        self.kind = kind
+        self.type = type_    # vox type, for aliases the aliased type
+        self.value = value   # const: LLVM value text, struct: VoxStruct
+        self.folded = None   # (value text, number) memo of evals.lookup
+        self.addr = None     # LLVM pointer to the value, None for the global @name
+
+    def __repr__(self):
+        return f"Symbol({self.kind} {self.name}: {self.type} = {self.value!r})"
+
+class Scope:
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.defined = {}  # (namespace key, name): None, in definition order, unwound by SymbolTable.pop()
+
+class SymbolTable:
+    def __init__(self):
+        self.values = {}  # name: [Symbol], innermost binding last
+        self.types = {}   # name: [Symbol]
+        self.scopes = [Scope(GLOBAL, "Vmain")]
+        self.type_cache = {}  # vox type text: _types_.VoxType, cleared whenever a type binding changes
+
+    def _namespace(self, kind: str) -> str:
+        return "types" if kind in type_kinds else "values"
+
+    def push(self, kind: str, name: str = ""):
+        self.scopes.append(Scope(kind, name))
+
+    def pop(self):
+        if len(self.scopes) == 1: return  # the global scope never goes away
+        for ns, name in reversed(self.scopes.pop().defined):
+            if ns == "types": self.type_cache.clear()
+            namespace = getattr(self, ns)
+            stack = namespace[name]
+            stack.pop()
+            if not stack: del namespace[name]
+
+    @property
+    def depth(self) -> int:
+        return len(self.scopes) - 1
+
+    def define(self, name: str, kind: str, type_: str, value=None) -> Symbol:
+        """Bind name in the innermost scope, a redefinition in the same scope replaces the old symbol."""
+        ns = self._namespace(kind)
+        if ns == "types": self.type_cache.clear()  # e.g. a redefined using alias
+        sym = Symbol(name, kind, type_, value)
+        stack = getattr(self, ns).setdefault(name, [])
+        scope = self.scopes[-1]
+        if (ns, name) in scope.defined:
+            stack[-1] = sym
+        else:
+            stack.append(sym)
+            scope.defined[(ns, name)] = None
+        return sym
+
+    def lookup(self, name: str):
+        """Innermost value symbol bound to name, or None."""
+        stack = self.values.get(name)
+        return stack[-1] if stack else None
+
+    def lookup_type(self, name: str):
+        stack = self.types.get(name)
+        return stack[-1] if stack else None
+
+    def _kind(self, name: str, kind: str):
+        sym = self.lookup(name)
+        return sym if sym is not None and sym.kind == kind else None
+
+    def const(self, name: str): return self._kind(name, CONST)
+    def var(self, name: str): return self._kind(name, VAR)
+    def arg(self, name: str): return self._kind(name, ARG)
+
+    def address(self, name: str) -> str:
+        """LLVM pointer operand a value is loaded from and stored to: a fn local's alloca slot or the global."""
+        sym = self.lookup(name)
+        return sym.addr if sym is not None and sym.addr is not None else f"@{name}"
+
+    def struct(self, name: str):
+        """VoxStruct for a struct type name, or None."""
+        sym = self.lookup_type(name)
+        return sym.value if sym is not None and sym.kind == STRUCT else None
+
+    def alias(self, name: str):
+        """Aliased type of a using alias, or None."""
+        sym = self.lookup_type(name)
+        return sym.type if sym is not None and sym.kind == ALIAS else None
+
+    def is_const(self, name: str) -> bool: return self.const(name) is not None
+    def is_var(self, name: str) -> bool: return self.var(name) is not None
+    def is_arg(self, name: str) -> bool: return self.arg(name) is not None
+
+    def global_symbols(self, kind: str) -> dict:
+        """name: Symbol of everything of kind bound in the global scope, in definition order."""
+        ns = self._namespace(kind)
+        namespace = getattr(self, ns)
+        out = {}
+        for key, name in self.scopes[0].defined:
+            if key != ns: continue
+            sym = namespace[name][0]
+            if sym.kind == kind: out[name] = sym
+        return out
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# Phase timers and counters behind Voxy.py --time-report.
+# Everything is a no-op until enabled is set, so the hooks can stay in hot paths.
+
+enabled = False
+phases = {}    # name: [wall s, cpu s, calls, nesting depth], in the order phases first ran
+counters = {}  # name: int
+_depth = 0
+
+def _cpu() -> float:
+    # own CPU time plus finished child processes (llc, opt, ld)
+    t = os.times()
+    return time.process_time() + t.children_user + t.children_system
+
+class phase:
+    """with timing.phase("name"): ... adds the block's wall and CPU time to that phase."""
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        global _depth
+        if not enabled: return self
+        if self.name not in phases: phases[self.name] = [0.0, 0.0, 0, _depth]
+        _depth += 1
+        self.wall = time.perf_counter()
+        self.cpu = _cpu()
+        return self
+
+    def __exit__(self, *exc):
+        global _depth
+        if not enabled: return False
+        _depth -= 1
+        entry = phases[self.name]
+        entry[0] += time.perf_counter() - self.wall
+        entry[1] += _cpu() - self.cpu
+        entry[2] += 1
+        return False
+
+def add(name: str, wall: float, cpu: float = 0.0):
+    """Time measured elsewhere (one llc process, one module) as a phase nested in the running one."""
+    if not enabled: return
+    entry = phases.setdefault(name, [0.0, 0.0, 0, _depth])
+    entry[0] += wall
+    entry[1] += cpu
+    entry[2] += 1
+
+def count(name: str, n: int = 1):
+    if enabled: counters[name] = counters.get(name, 0) + n
+
+def report(out=sys.stdout):
+    out.write("\n=== Time report ===\n")
+    out.write(f"{'phase':<28}{'wall ms':>12}{'cpu ms':>12}{'calls':>8}\n")
+    for name, (wall, cpu, calls, depth) in phases.items():
+        out.write(f"{'  ' * depth + name:<28}{wall * 1000:>12.2f}{cpu * 1000:>12.2f}{calls:>8}\n")
+    if counters:
+        out.write("counters:\n")
+        for name, value in counters.items():
+            out.write(f"  {name:<26}{value:>12}\n")
@@ -0,0 +1,222 @@
+import compiler_modules.ctx as ctx
+import compiler_modules.cache as cache
+import compiler_modules.compy as compy
+import compiler_modules.preproc as preproc
+import compiler_modules.functions as functions
+import compiler_modules.structs as structs
+import compiler_modules._types_ as _types_
+import compiler_modules.errors as errors
+import compiler_modules.log as log
+import compiler_modules.symbols as symbols
+import compiler_modules.resolver as resolver
+import hashlib
+import json
+import os
+import re
+
+# Separate compilation: every imported .vpy is its own translation unit with its own .ll,
+# plus a declaration stub (<unit>.vpyi.json) that importers load instead of the module's source.
+# A unit is regenerated only when its source, its imports or the interface of a dependency changed.
+
+# stub keys that importers see, a change to any of them rebuilds the importers
+interface_keys = ("consts", "vars", "functions", "structs", "aliases", "type_defs", "globals", "init")
+
+def unit_name(path: str) -> str:
+    base = re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    return f"{base}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+
+def interface_hash(stub: dict) -> str:
+    iface = {k: stub[k] for k in interface_keys}
+    return cache.sha256_bytes(json.dumps(iface, sort_keys=True).encode("utf-8"))
+
+def read_stub(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def probes_valid(stub: dict) -> bool:
+    return all(cache.sha256_file(p) == digest for p, digest in stub["probes"].items())
+
+def llvm_global_type(vox_type: str) -> str:
+    if ctx.context.symbols.struct(vox_type) is not None: return f"%{vox_type}"
+    return _types_.vox_type_to_llvm(vox_type)
+
+def load_stub(stub: dict):
+    """Make a dependency's exported symbols visible to the current translation unit."""
+    c = ctx.context
+    for name, (value, type_) in stub["consts"].items():
+        c.symbols.define(name, symbols.CONST, type_, value)
+        c.extern_names.add(name)
+    for name, type_ in stub["vars"].items():
+        c.symbols.define(name, symbols.VAR, type_)
+        c.extern_names.add(name)
+    for name, sig in stub["functions"].items():
+        func = functions.Funtion(name, args={}, ret_type="void", body=[])
+        func.args = sig["args"]
+        func.ret_type = sig["ret_type"]
+        func.decl = sig.get("decl")  # declared once this unit calls it
+        c.functions[name] = [func, True]
+        c.extern_names.add(name)
+    for name, fields in stub["structs"].items():
+        c.symbols.define(name, symbols.STRUCT, name, structs.VoxStruct(name, fields))
+        c.extern_names.add(name)
+    for name, type_ in stub["aliases"].items():
+        c.symbols.define(name, symbols.ALIAS, type_)
+        c.extern_names.add(name)
+    for bucket, add in (("type_defs", c.module.add_type), ("globals", c.module.add_global)):
+        for line in stub[bucket]:
+            if c.module.has_entry(line): continue
+            add(line)
+            c.extern_entries.add(line)
+    if stub["init"]:
+        line = f"declare void @{stub['init']}()"
+        if not c.module.has_entry(line):
+            c.module.add_declaration(line)
+            c.extern_entries.add(line)
+
+def export_stub(init: str) -> dict:
+    """Interface of the translation unit that was just generated, without what it loaded itself."""
+    c = ctx.context
+    own = lambda name: name not in c.extern_names
+    stub = {
+        "consts": {n: [s.value, s.type] for n, s in c.symbols.global_symbols(symbols.CONST).items() if own(n)},
+        "vars": {n: s.type for n, s in c.symbols.global_symbols(symbols.VAR).items() if own(n)},
+        "functions": {},
+        "structs": {n: s.value.fields for n, s in c.symbols.global_symbols(symbols.STRUCT).items() if own(n)},
+        "aliases": {n: s.type for n, s in c.symbols.global_symbols(symbols.ALIAS).items() if own(n)},
+        "type_defs": [l for l in c.module.type_defs if l not in c.extern_entries],
+        "globals": [],
+        "init": init,
+        "libs": list(c.libs_to_link),
+    }
+    for name, (func, is_extern) in c.functions.items():
+        if not own(name): continue
+        stub["functions"][name] = {"args": func.args, "ret_type": func.ret_type,
+                                   "decl": func.decl if is_extern else functions.declaration(func)}
+    for name, (value, type_) in stub["consts"].items():
+        kind = "global" if value == f"@{name}" else "constant"  # runtime initialized consts are globals
+        stub["globals"].append(f"@{name} = external {kind} {llvm_global_type(type_)}")
+    for name, type_ in stub["vars"].items():
+        stub["globals"].append(f"@{name} = external global {llvm_global_type(type_)}")
+    return stub
+
+class UnitBuilder:
+    def __init__(self, build_dir: str, os_name: str, arch: str, dialect: str):
+        self.build_dir = build_dir
+        self.os_name = os_name
+        self.arch = arch
+        self.dialect = dialect
+        self.stubs = {}       # abs path: stub of every finished unit
+        self.order = []       # abs paths, dependencies before their importers
+        self.ll_paths = {}    # abs path: .ll path
+        self.visiting = set()
+        self.regenerated = [] # abs paths whose IR was written this build
+        self.origins = {}     # abs path: line origins of its preprocessed text, for error locations
+        self.graphs = {}      # abs path: import graph of its preprocessing
+        self.failed = set()   # abs paths of units that reported errors or import one that did
+
+    def transitive(self, imports: list) -> list:
+        """All units reachable from imports, dependencies first."""
+        seen = set()
+        order = []
+        def visit(path):
+            if path in seen: return
+            seen.add(path)
+            for dep in self.stubs[path]["imports"]: visit(dep)
+            order.append(path)
+        for path in imports: visit(path)
+        return order
+
+    def preprocess(self, path: str, code: str):
+        ctx.reset()
+        ctx.context.separate_modules = True
+        errors_before = errors.count
+        preprocessed = preproc.PreProcess(code, path)
+        if errors.count != errors_before: self.failed.add(path)
+        self.origins[path] = ctx.context.line_origins
+        self.graphs[path] = ctx.context.import_graph
+        return preprocessed, list(dict.fromkeys(ctx.context.module_imports)), dict(ctx.context.import_probes)
+
+    def build(self, path: str, ll_path: str = None, is_main: bool = False) -> dict:
+        path = os.path.abspath(path)
+        if path in self.stubs: return self.stubs[path]
+        if path in self.visiting: errors.FATAL(f"Import cycle through '{path}'")
+        self.visiting.add(path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        name = unit_name(path)
+        if ll_path is None: ll_path = os.path.join(self.build_dir, name + ".ll")
+        stub_path = ll_path[:-3] + ".vpyi.json"
+        key = cache.make_key(path + "\0" + code, self.os_name, self.arch, self.dialect)
+
+        old = read_stub(stub_path)
+        if old is not None and old["key"] == key and probes_valid(old) and os.path.exists(ll_path):
+            preprocessed, imports, probes = None, old["imports"], old["probes"]
+        else:
+            old = None
+            preprocessed, imports, probes = self.preprocess(path, code)
+
+        for dep in imports: self.build(dep)
+        deps = self.transitive(imports)
+        dep_hashes = {dep: self.stubs[dep]["hash"] for dep in deps}
+
+        if old is not None and old["deps"] == dep_hashes:
+            stub = old
+        else:
+            if preprocessed is None: preprocessed, imports, probes = self.preprocess(path, code)
+            errors_before = errors.count
+            stub = self.generate(path, preprocessed, deps, ll_path, None if is_main else f"__vinit_{name}")
+            stub.update({"key": key, "imports": imports, "probes": probes, "deps": dep_hashes, "graph": self.graphs.get(path, {})})
+            stub["hash"] = interface_hash(stub)
+            if errors.count != errors_before or any(dep in self.failed for dep in deps): self.failed.add(path)
+            if path in self.failed:
+                # importers still see the stub in memory, but nothing on disk may pass for a good build
+                for stale in (ll_path, stub_path):
+                    if os.path.exists(stale): os.remove(stale)
+            else:
+                with open(stub_path, "w", encoding="utf-8") as f:
+                    json.dump(stub, f, indent=2)
+            self.regenerated.append(path)
+
+        resolver.record(stub.get("graph", {}))
+        self.visiting.discard(path)
+        self.stubs[path] = stub
+        self.ll_paths[path] = ll_path
+        self.order.append(path)
+        return stub
+
+    def generate(self, path: str, preprocessed: str, deps: list, ll_path: str, init: str) -> dict:
+        ctx.reset()
+        ctx.context.line_origins = self.origins.get(path, [])
+        ctx.context.source_path = path
+        for dep in deps: load_stub(self.stubs[dep])
+        if init is None:
+            # the program entry runs every module's top level code first, dependencies first
+            for dep in deps:
+                if self.stubs[dep]["init"]: ctx.context.module.vmain.emit(f"call void @{self.stubs[dep]['init']}()")
+        else:
+            ctx.context.Vmain_header = f"define void @{init}( ) {{\n"
+            ctx.context.Vmain_exit = "  ret void\n}\n"
+        compy.generate_ir(preprocessed, ll_path, save=True, source_name=path)
+        return export_stub(init)
+
+def compile_modules(main_path: str, output_obj: str, os_name: str, arch: str = "64", dialect: str = "inteldialect"):
+    """
+    Compile main_path and every module it imports into separate .ll files.
+    Module outputs go to voxy_modules/ next to output_obj, the program itself to output_obj + ".ll".
+    Returns (.ll paths with dependencies first, libraries to link).
+    """
+    build_dir = os.path.join(os.path.dirname(output_obj) or ".", "voxy_modules")
+    os.makedirs(build_dir, exist_ok=True)
+    builder = UnitBuilder(build_dir, os_name, arch, dialect)
+    builder.build(main_path, ll_path=output_obj + ".ll", is_main=True)
+
+    libs = []
+    for path in builder.order:
+        for lib in builder.stubs[path]["libs"]:
+            if lib not in libs: libs.append(lib)
+    log.info(f"Regenerated {len(builder.regenerated)} of {len(builder.order)} units")
+    return [builder.ll_paths[p] for p in builder.order], libs
@@ -1,12 +1,15 @@
 import compiler_modules.ctx as ctx
 import compiler_modules.errors as errors
+import compiler_modules.log as log
+
+def ScopeIR(scope: str):
+    """ir.IRFunction code for scope goes to."""
+    if scope == "Vmain" or scope is None: return ctx.context.module.vmain
+    return ctx.context.functions[scope][0].ir
 
 def AddToScope(code: str, scope: str, show=False):
-    if show: print(f"SCOPE: {scope}, CODE: {code}")
-    if scope == "Vmain" or scope is None:   # Vmain
-        ctx.context.Vmain += code
-    else:    # regular function
-        ctx.context.functions[scope][0].body += code
+    if show: log.trace(f"SCOPE: {scope}, CODE: {code}")
+    ScopeIR(scope).emit(code)
 
 def GetAssignValue(toks: list[str]) -> str:
     type_found = False
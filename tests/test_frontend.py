@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+# The front end turns a whole program into typed nodes, these pin the shape of the statements it handles.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import compiler_modules.frontend as frontend
+import compiler_modules.nodes as nodes
+
+def parse(code: str) -> list:
+    return frontend.parse_program(code)
+
+class StatementTest(unittest.TestCase):
+    def test_if_elif_else(self):
+        [node] = parse("if x == 1:\n    a(1)\nelif x == 2:\n    b(2)\nelse:\n    c(3)\nendif\n")
+        self.assertIsInstance(node, nodes.If)
+        self.assertEqual([cond for cond, _ in node.branches], ["x == 1", "x == 2"])
+        self.assertEqual([[call.name for call in body] for _, body in node.branches], [["a"], ["b"]])
+        [call] = node.else_body
+        self.assertIsInstance(call, nodes.Call)
+        self.assertEqual((call.name, call.args), ("c", ["3"]))
+
+    def test_if_without_else(self):
+        [node] = parse("if x:\n    a()\nendif\n")
+        self.assertEqual(len(node.branches), 1)
+        self.assertIsNone(node.else_body)
+
+    def test_for(self):
+        [node] = parse("for i in 0..n:\n    a(i)\nendfor\n")
+        self.assertIsInstance(node, nodes.For)
+        self.assertEqual((node.var, node.start, node.stop), ("i", "0", "n"))
+        self.assertEqual(node.body[0].args, ["i"])
+
+    def test_dyn_import_over_several_lines(self):
+        code = "dyn_import fn int MessageBoxA(\n    hwnd: int,\n    text: ptr[char]\n)\n*(0x10): int = 5\n"
+        imp, after = parse(code)
+        self.assertIsInstance(imp, nodes.DynImport)
+        self.assertEqual((imp.name, imp.ret_type), ("MessageBoxA", "int"))
+        self.assertEqual(imp.params, [("hwnd", "int"), ("text", "ptr[char]")])
+        # the continuation lines are consumed, the next statement keeps its own line
+        self.assertIsInstance(after, nodes.MemWrite)
+        self.assertEqual(after.line, 5)
+
+    def test_mem_write(self):
+        [node] = parse("*(0x10 + 4): uint8 = 255\n")
+        self.assertIsInstance(node, nodes.MemWrite)
+        self.assertEqual((node.addr, node.type, node.value), ("0x10 + 4", "uint8", "255"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Lowered programs must be IR that llc accepts, a type mismatch between a value and its use fails there.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VOXY = os.path.join(ROOT, "Voxy.py")
+
+TAKE = "fn void take(v: int64):\n    return\nendfn\n"
+
+@unittest.skipUnless(shutil.which("llc"), "needs llc")
+class ValidIRTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def lower(self, code: str) -> str:
+        """IR of code after checking that it compiled without errors and that llc accepts it."""
+        src = os.path.join(self.dir, "main.vpy")
+        with open(src, "w", encoding="utf-8") as f:
+            f.write(code)
+        proc = subprocess.run([sys.executable, VOXY, "-c", src, "-o", os.path.join(self.dir, "prog.out"), "--no-cache"],
+                              cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        ll = os.path.join(self.dir, "prog.asm.ll")
+        llc = subprocess.run(["llc", ll, "-o", os.devnull], capture_output=True, text=True)
+        self.assertEqual(llc.returncode, 0, llc.stderr)
+        with open(ll, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_const_to_wider_param(self):
+        ir = self.lower("const A: int = 5\nconst N: char = -1\n" + TAKE + "take(A)\ntake(N)\n")
+        self.assertIn("call void @take(i64 5)", ir)
+        self.assertIn("call void @take(i64 -1)", ir)
+
+    def test_runtime_const_to_wider_param(self):
+        ir = self.lower("fn int get():\n    return 3\nendfn\nconst R: int = get()\n" + TAKE + "take(R)\n")
+        self.assertIn("load i32, i32* @R", ir)
+
+    def test_vars_to_other_width_params(self):
+        code = ("var C: int = 7\nvar U: uint8 = 200\n" + TAKE + "fn void small(v: char):\n    return\nendfn\n"
+                "take(C)\ntake(U)\nsmall(C)\n")
+        ir = self.lower(code)
+        self.assertIn("sext i32", ir)
+        self.assertIn("zext i8", ir)
+        self.assertIn("trunc i32", ir)
+
+    def test_loop_var_and_local_to_wider_param(self):
+        code = (TAKE + "fn void each(n: int):\n    var k: int = 2\n    take(k)\n    take(n)\n    return\nendfn\n"
+                "for i in 0..3:\n    take(i)\nendfor\n")
+        self.lower(code)
+
+    def test_sibling_loops(self):
+        self.lower(TAKE + "for i in 0..3:\n    take(i)\nendfor\nfor i in 0..2:\n    take(i)\nendfor\n")
+
+    def test_return_type(self):
+        ir = self.lower("fn int add(a: int, b: int):\n    return a\nendfn\nfn int64 wide(a: int):\n    return a\nendfn\n")
+        self.assertIn("define i32 @add(i32 %a, i32 %b)", ir)
+        self.assertIn("define i64 @wide(i32 %a)", ir)
+
+    def test_switch_case_out_of_range(self):
+        code = ("var b: char = 3\nfn void f(v: int):\n    return\nendfn\n"
+                "if b == 1:\n    f(1)\nelif b == 300:\n    f(2)\nelif b == 3:\n    f(3)\nendif\n")
+        ir = self.lower(code)
+        self.assertNotIn("switch", ir)
+        self.assertIn("icmp eq i64", ir)  # 300 is compared after widening, not truncated to 44
+
+    def test_switch(self):
+        code = ("var b: char = 3\nfn void f(v: int):\n    return\nendfn\n"
+                "if b == 1:\n    f(1)\nelif b == 2:\n    f(2)\nelif b == 3:\n    f(3)\nendif\n")
+        self.assertIn("switch i8", self.lower(code))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Builds that report errors must not leave a manifest behind, or the next run would skip them as up to date.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VOXY = os.path.join(ROOT, "Voxy.py")
+
+GOOD = "var x: int = 3\n"
+BROKEN = "bump(1)\nfn void bump(v: int):\n    return\nendfn\n"
+
+def has_toolchain() -> bool:
+    return shutil.which("llc") is not None and shutil.which("ld") is not None
+
+class ErroringBuildTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = tempfile.mkdtemp()
+        self.output = os.path.join(self.dir, "prog.out")
+        self.manifest = self.output + ".manifest.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def write(self, name: str, code: str) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        return path
+
+    def build(self, main: str, *flags):
+        # std/ and vox_path.json are found relative to the repo
+        env = dict(os.environ, VOXY_CACHE=self.cache)
+        return subprocess.run([sys.executable, VOXY, "-n", main, "-o", self.output, *flags],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+
+    def assert_fails_twice(self, main: str, message: str, *flags):
+        for run in (1, 2):  # the second run must not restore anything from the first
+            proc = self.build(main, *flags)
+            self.assertNotEqual(proc.returncode, 0, f"run {run} succeeded")
+            self.assertIn(message, proc.stderr, f"run {run}")
+            self.assertFalse(os.path.exists(self.manifest), f"run {run} wrote a manifest")
+            self.assertFalse(os.path.exists(self.output), f"run {run} linked")
+
+    def test_error_in_main(self):
+        self.assert_fails_twice(self.write("main.vpy", BROKEN), "Unknown function: bump")
+
+    def test_error_in_imported_module(self):
+        self.write("mod.vpy", "fn void helper(v: int):\n    nosuch()\n    return\nendfn\n")
+        main = self.write("main.vpy", 'import "mod.vpy"\n' + GOOD)
+        self.assert_fails_twice(main, "Unknown function: nosuch", "--modules")
+        self.assertEqual([f for f in os.listdir(os.path.join(self.dir, "voxy_modules")) if f.endswith(".vpyi.json")], [])
+
+    @unittest.skipUnless(has_toolchain(), "needs llc and ld")
+    def test_error_after_good_build_keeps_good_manifest(self):
+        main = self.write("main.vpy", GOOD)
+        self.assertEqual(self.build(main).returncode, 0)
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            good = f.read()
+        self.write("main.vpy", BROKEN)
+        proc = self.build(main)
+        self.assertNotEqual(proc.returncode, 0)
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), good)
+        # the broken source still differs from what the manifest recorded, so it is compiled again
+        self.assertIn("Unknown function: bump", self.build(main).stderr)
+
+if __name__ == "__main__":
+    unittest.main()